@@ -1,8 +1,12 @@
 from collections import defaultdict
+from fractions import Fraction
 import random
 from time import process_time
 
 from weighted_automaton import *
+from observation_table import ObservationTable
+from words import EPSILON, codes, word
+from instrumentation import NO_INSTRUMENTATION
 
 def closed_by_hand(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=True):
 	"""
@@ -29,6 +33,107 @@ def closed_by_hand(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose
 		return False
 	return list(int(x) for x in res.split())
 
+def closed_by_rows(check_closed):
+	"""
+	Batch closedness check made from a check for a single row, for backends without a batch version
+	A batch check gets all rows T at once (TxE can be given like txE) and returns a dictionary mapping each t in T
+	to its linear combination or False, in the order of T. With first=True it stops after the first t that is False
+	"""
+	def check_closed_batch(wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+		result = {}
+		for i, t in enumerate(T):
+			result[t] = check_closed(wfa, S, E, t, membership_queries, SxE=SxE, txE=None if TxE is None else TxE[i], verbose=verbose)
+			if first and result[t] is False:
+				break
+		return result
+	return check_closed_batch
+
+def solve_rows(solve, name, S, E, T, membership_queries, TxE=None, first=True, verbose=False):
+	"""
+	Batch closedness check (see closed_by_rows) for a backend that has already prepared S x E
+	solve(txE) returns the linear combination giving txE, or None if it does not exist
+	"""
+	result = {}
+	for i, t in enumerate(T):
+		txE = [membership_queries[t+e] for e in E] if TxE is None else TxE[i]
+		c = solve(txE)
+		if c is None:
+			if verbose:
+				print(name + ": Fail, len S/len E:", len(S), len(E), "t:", t)
+			result[t] = False
+			if first:
+				break
+		else:
+			result[t] = c
+	return result
+
+class IncrementalBackend:
+	"""
+	Base class for closedness backends which keep a solver for S x E between calls (see IncrementalHNF)
+	When rows are appended to S or columns are appended to E, the solver is extended instead of rebuilt,
+	if the table changed in any other way (for example, a row was rescaled by its GCD), it is rebuilt
+	An instance is a check_closed backend, its method batch is the matching check_closed_batch
+	Subclasses implement reset(width), add_row(row), add_columns(columns) and solve(txE) for their solver,
+	and set fallback to the single call backend used when SxE is not a table of the current S
+	Use a new instance for every learning run
+	"""
+	name = "Incremental"
+	fallback = None
+
+	def __init__(self):
+		self.S = []
+		self.E = []
+		self.rows = []
+		self.SxE = None
+		self.reset(0)
+
+	def rebuild(self, S, E, SxE):
+		self.S = list(S)
+		self.E = list(E)
+		self.rows = [list(row) for row in SxE]
+		self.reset(len(E))
+		for row in self.rows:
+			self.add_row(row)
+
+	def update(self, S, E, membership_queries, SxE=None):
+		n, k = len(self.S), len(self.E)
+		if SxE is not None and SxE is self.SxE and len(S) == n and len(E) == k:
+			return # Same table as the previous call
+		self.SxE = SxE
+		if S[:n] != self.S or E[:k] != self.E:
+			if SxE is None:
+				SxE = [[membership_queries[s+e] for e in E] for s in S]
+			self.rebuild(S, E, SxE)
+			return
+		if SxE is not None and any(SxE[i][:k] != row[:k] for i, row in enumerate(self.rows)):
+			self.rebuild(S, E, SxE)
+			return
+		if len(E) > k:
+			if SxE is None:
+				columns = [[membership_queries[s+e] for s in self.S] for e in E[k:]]
+			else:
+				columns = [[SxE[i][j] for i in range(n)] for j in range(k, len(E))]
+			self.add_columns(columns)
+			for i, row in enumerate(self.rows):
+				row.extend(column[i] for column in columns)
+			self.E = list(E)
+		for i in range(n, len(S)):
+			row = [membership_queries[S[i]+e] for e in E] if SxE is None else list(SxE[i])
+			self.add_row(row)
+			self.rows.append(row)
+			self.S.append(S[i])
+
+	def __call__(self, wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=False):
+		if SxE is not None and len(SxE) != len(S):
+			# Not a table of the current S (for example when testing if a row of S is redundant)
+			return self.fallback(wfa, S, E, t, membership_queries, SxE=SxE, txE=txE, verbose=verbose)
+		self.update(S, E, membership_queries, SxE)
+		return solve_rows(self.solve, self.name, S, E, [t], membership_queries, None if txE is None else [txE], verbose=verbose)[t]
+
+	def batch(self, wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+		self.update(S, E, membership_queries, SxE)
+		return solve_rows(self.solve, self.name, S, E, T, membership_queries, TxE, first, verbose)
+
 def counterexample_by_hand(wfa, model, membership_queries):
 	"""
 	Asks the user to create a counterexample w by hand,
@@ -60,7 +165,7 @@ def random_counterexample(wfa, model, membership_queries, tries=None, min_size=0
 		tries = 2*len(wfa.alphabet)*len(wfa.weights) + 3
 	n = len(wfa.weights)
 	for k in range(1, tries):
-		cex = ''.join(random.choices(wfa.alphabet, k=k+min_size))
+		cex = word(random.choices(wfa.alphabet, k=k+min_size))
 		if cex not in membership_queries:
 			membership_queries[cex] = wfa.member(cex)
 		if membership_queries[cex] != model.member(cex):
@@ -71,13 +176,60 @@ def random_counterexample(wfa, model, membership_queries, tries=None, min_size=0
 			print("Tried:", cex)
 	return None
 
-# If performance becomes an issue, try replacing lists with sets for S, E, SA
-# Be careful: Some functions (like create machine) may depend on the ordering of the elements
-def weighted_Lstar(wfa, check_closed=closed_by_hand, check_counterexample=counterexample_by_hand, verbose=False, count=False):
-	"""Learns wfa using Lstar for weighted automata"""
-	S = [""]
-	E = [""]
-	membership_queries = {} #Keep a dictionary of all previous membership queries to avoid repeated calls
+def all_suffixes(wfa, model, cex, S, membership_queries, scale=None):
+	"""The columns added to E for the counterexample cex: all of its suffixes (the standard way of handling counterexamples)"""
+	return list(suffixes(cex))
+
+def rivest_schapire(wfa, model, cex, S, membership_queries, scale=None):
+	"""
+	The columns added to E for the counterexample cex: a single distinguishing suffix, found by binary search (Rivest & Schapire)
+	State j of model is the row of S[j] (divided by scale[S[j]] if scale is given), so
+	alpha(i) = sum over j of model.member_distribution(cex[:i])[j] * wfa.member(S[j] + cex[i:]) / scale[S[j]]
+	is wfa.member(cex) for i = 0 and model.member(cex) for i = len(cex)
+	If alpha(i) != alpha(i+1), then some row S[j] + cex[i] is not the linear combination used by the model on column cex[i+1:]
+	Uses O(log len(cex)) rounds of membership queries, one query for each nonzero state of the model
+	"""
+	def alpha(i):
+		distribution = model.member_distribution(cex[:i])[1]
+		missing = [S[j] + cex[i:] for j, x in enumerate(distribution) if x != 0 and S[j] + cex[i:] not in membership_queries]
+		membership_queries.update(zip(missing, wfa.member_batch(missing))) #One batch per round, for targets with slow queries
+		total = 0
+		for j, x in enumerate(distribution):
+			if x != 0:
+				se = S[j] + cex[i:]
+				if scale is None:
+					total += x * membership_queries[se]
+				else:
+					total += x * Fraction(membership_queries[se], scale[S[j]] if scale[S[j]] else 1)
+		return total
+	lo, hi = 0, len(cex)
+	alpha_lo = alpha(lo)
+	if hi == 0 or alpha_lo == alpha(hi):
+		return all_suffixes(wfa, model, cex, S, membership_queries) #Not a counterexample for model, nothing to search for
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		alpha_mid = alpha(mid)
+		if alpha_mid != alpha_lo:
+			hi = mid
+		else:
+			lo, alpha_lo = mid, alpha_mid
+	return [cex[lo+1:]]
+
+def weighted_Lstar(wfa, check_closed=closed_by_hand, check_counterexample=counterexample_by_hand, counterexample_suffixes=all_suffixes, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False, count=False):
+	"""
+	Learns wfa using Lstar for weighted automata
+	check_closed_batch checks all rows of SA in one call (see closed_by_rows), by default check_closed is called for every row
+	counterexample_suffixes decides which columns are added to E for a counterexample, use rivest_schapire to keep E small
+	With count=True, also returns statistics, the last of which is the number of columns of the final table
+	Give an Instrumentation object as instrument to get the time spent in each phase of the algorithm (see instrumentation.py)
+	"""
+	if check_closed_batch is None:
+		check_closed_batch = closed_by_rows(instrument.wrap("backend call", check_closed))
+	table = ObservationTable(wfa)
+	S = table.S # S and E are ordered sets: create_machine depends on the ordering of the elements
+	E = table.E
+	membership_queries = table.queries #Keep a dictionary of all previous membership queries to avoid repeated calls
+	alphabet = codes(wfa.alphabet) #The letters as they appear in words
 	membership_count = 0
 	closed_count = 0
 	equivalence_count = 0
@@ -88,26 +240,23 @@ def weighted_Lstar(wfa, check_closed=closed_by_hand, check_counterexample=counte
 		closed = False
 		while not closed:
 			closed = True
-			for s in S:
-				for e in E:
-					se = s+e
-					if se not in membership_queries:
-						membership_queries[se] = wfa.member(se)
-			SA = list(s + a for s in S for a in wfa.alphabet)
+			SA = list(s + a for s in S for a in alphabet)
+			with instrument.phase("fill table"):
+				table.fill(S + SA)
 			lin_com = defaultdict(list)
 			closed_count += 1
+			T = [t for t in SA if t not in S]
+			if verbose:
+				print("Checking:", T)
+			instrument.record("closedness size", (len(S), len(E)))
+			with instrument.phase("check_closed"):
+				results = check_closed_batch(wfa, S, E, T, membership_queries, verbose=verbose)
 			for t in SA: #Check if the table is closed
 				if t in S: #Check if t is in S: cases of the form 0 0 ... 0 1 0 ... 0 0
 					i = S.index(t)
 					lin_com[t] = list(1 if j == i else 0 for j in range(0, len(S)))
 				else:
-					if verbose:
-						print("Checking:", t)
-					for e in E:
-						te = t+e
-						if te not in membership_queries:
-							membership_queries[te] = wfa.member(te)
-					c = check_closed(wfa, S, E, t, membership_queries, verbose=verbose)
+					c = results[t]
 					if c is False:
 						closed = False
 						cex_found = False
@@ -117,13 +266,15 @@ def weighted_Lstar(wfa, check_closed=closed_by_hand, check_counterexample=counte
 						lin_com[t] = c
 		if cex_found and count:
 				closed_after_counterexample += 1
-		model = create_machine(wfa.alphabet, S, (wfa.member(s) for s in S), lin_com)
+		with instrument.phase("create_machine"):
+			model = create_machine(wfa.alphabet, S, (table.value(s, EPSILON) for s in S), lin_com)
 		membership_count = len(membership_queries)
 		equivalence_count += 1
 		if verbose:
 			print("Finding counterexample")
 		teacher_start = process_time()
-		cex = check_counterexample(wfa, model, membership_queries)
+		with instrument.phase("equivalence query"):
+			cex = word(check_counterexample(wfa, model, membership_queries)) #Teachers may also return lists of letters
 		teacher_stop = process_time()
 		total_teacher_time += teacher_stop - teacher_start
 		if verbose:
@@ -136,11 +287,17 @@ def weighted_Lstar(wfa, check_closed=closed_by_hand, check_counterexample=counte
 					print("Times we checked if the table is closed:", closed_count)
 					print("Number of equivalence queries:", equivalence_count)
 					print("Number of times the table was closed after finding a counterexample:", closed_after_counterexample)
+					print("Number of columns:", len(E))
+			instrument.count_run(len(membership_queries), closed_count, equivalence_count)
 			if count:
-				return model, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time
+				return model, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time, len(E)
 			return model
 		cex_found = True
-		E.extend(e for e in suffixes(cex) if e not in E)
+		with instrument.phase("counterexample processing"):
+			columns = [e for e in counterexample_suffixes(wfa, model, cex, S, membership_queries) if e not in E]
+			if not columns:
+				columns = [e for e in suffixes(cex) if e not in E]
+			E.extend(columns)
 		
 	
 def compare_machines(aut, res, prover=random_counterexample):
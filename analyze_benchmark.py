@@ -1,15 +1,26 @@
+from results_store import load_results, aggregate
+
+def compare_counterexample_handling(method, baseline, records=None):
+	"""
+	Print the average number of columns and membership queries of method (for example using rivest_schapire)
+	and baseline (for example using all_suffixes), with the savings of method in percentages
+	"""
+	if records is None:
+		records = load_results(status="done")
+	columns = aggregate(records, "columns")
+	queries = aggregate(records, "membership_queries")
+	for (m, alph, nstates), c in sorted(columns.items()):
+		if m == method and (baseline, alph, nstates) in columns:
+			c_base = columns[(baseline, alph, nstates)]
+			q, q_base = queries[(method, alph, nstates)], queries[(baseline, alph, nstates)]
+			print("Columns", alph, nstates, c, "vs", c_base, "saved {0:.1f}%".format(100 - 100*c/c_base))
+			print("Queries", alph, nstates, q, "vs", q_base, "saved {0:.1f}%".format(100 - 100*q/q_base))
 
 if __name__ == "__main__":
 	method = "GapHKCBasis"
-	alph_todo = (['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'b', 'c', 'd'])
-	for alph in alph_todo:
-		for nstates in range(1, 11):
-			total = 0
-			for i in range(1, 101):
-				filename = "Examples/benchmark/Results" + method + "/" + "".join(alph) + str(nstates) + "_" + str(i) + ".txt"
-				with open(filename, "r") as file:
-					data = file.read().split("\n")
-				result_states = int(data[2])
-				if nstates == result_states:
-					total += 1
-			print("Total", alph, nstates, total)
+	records = load_results(method=method)
+	minimal = [r for r in records if r["status"] == "done" and r["states"] == r["nstates"]]
+	totals = aggregate(minimal, "states", key=("alphabet", "nstates"), function=len)
+	for alph, nstates in sorted(set((r["alphabet"], r["nstates"]) for r in records)):
+		print("Total", list(alph), nstates, totals.get((alph, nstates), 0))
+	#compare_counterexample_handling("GapHKCRivestSchapire", "GapHKC")
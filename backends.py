@@ -0,0 +1,64 @@
+"""
+Registry of the backends of the learners, resolved by name
+Every backend is given as (module, attribute) and the module is only imported when the backend is first asked for,
+so choosing a native backend never loads Sage/GAP or Z3
+closedness: check_closed of the learners, batch: check_closed_batch, equivalence: check_counterexample
+Example: learner("weighted_Lstar")(aut, check_closed=closedness("hnf"), check_counterexample=equivalence("tzeng"))
+"""
+from importlib import import_module
+
+LEARNERS = {
+	"weighted_Lstar": ("WLstar", "weighted_Lstar"),
+	"modified_weighted_Lstar": ("sage_main", "modified_weighted_Lstar"),
+	"minimal_weighted_Lstar": ("sage_main", "minimal_weighted_Lstar"),
+}
+CLOSEDNESS = {
+	"gap": ("sage_main", "closed_by_gap"),
+	"z3": ("main", "closed_by_z3"),
+	"incremental_z3": ("main", "IncrementalZ3"),
+	"hnf": ("native_main", "closed_by_hnf"),
+	"incremental_hnf": ("native_main", "IncrementalHNF"),
+	"bareiss": ("rational_main", "closed_by_bareiss"), # Over the rationals, use a teacher which accepts rational models
+	"by_hand": ("WLstar", "closed_by_hand"),
+}
+BATCH = {
+	"gap": ("sage_main", "closed_by_gap_batch"),
+	"z3": ("main", "closed_by_z3_batch"),
+	"hnf": ("native_main", "closed_by_hnf_batch"),
+	"bareiss": ("rational_main", "closed_by_bareiss_batch"),
+}
+EQUIVALENCE = {
+	"HKC": ("sage_main", "HKC"),
+	"tzeng": ("native_main", "tzeng"),
+	"random_counterexample": ("WLstar", "random_counterexample"),
+	"random_tester": ("numpy_main", "RandomTester"),
+}
+
+def resolve(registry, name):
+	"""The backend called name in registry, its module is imported if this is the first use"""
+	if name not in registry:
+		raise ValueError("Unknown backend " + repr(name) + ", choose from: " + ", ".join(registry))
+	module, attribute = registry[name]
+	return getattr(import_module(module), attribute)
+
+def learner(name):
+	return resolve(LEARNERS, name)
+
+def closedness(name, **kwargs):
+	"""
+	The closedness check called name
+	Incremental backends are classes: they get a new instance (with the given arguments) on every call, use one per learning run
+	"""
+	backend = resolve(CLOSEDNESS, name)
+	return backend(**kwargs) if isinstance(backend, type) else backend
+
+def batch(name, backend=None):
+	"""The batch closedness check called name, for an incremental backend the batch method of backend (its instance for this run)"""
+	if backend is not None and hasattr(backend, "batch"):
+		return backend.batch
+	return resolve(BATCH, name)
+
+def equivalence(name, **kwargs):
+	"""The equivalence query called name, classes (like RandomTester) get a new instance with the given arguments"""
+	teacher = resolve(EQUIVALENCE, name)
+	return teacher(**kwargs) if isinstance(teacher, type) else teacher
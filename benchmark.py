@@ -1,14 +1,15 @@
 from weighted_automaton import *
 from WLstar import *
-#from main import *
-from sage_main import *
+import backends
+from results_store import make_record, append_result
 
 from time import perf_counter, process_time
 
 if __name__ == "__main__":
 	method = "GapHKC"
-	closed = closed_by_gap
-	counterexample = HKC
+	closed = backends.closedness("gap") #Any name of backends.CLOSEDNESS, for example "z3" or "hnf"
+	counterexample = backends.equivalence("HKC")
+	cex_suffixes = all_suffixes #Use rivest_schapire (and a different method name) to add a single suffix per counterexample
 
 	progress_name = "Examples/benchmark/Results" + method + "/progress.txt"
 	with open(progress_name, "r") as progress_file:
@@ -28,19 +29,11 @@ if __name__ == "__main__":
 				aut = load_automaton(filename=aut_file)
 				start_time = process_time()
 				start_perf = perf_counter()
-				result = weighted_Lstar(aut, check_closed=closed, check_counterexample=counterexample, count=True)
+				result = weighted_Lstar(aut, check_closed=closed, check_counterexample=counterexample, counterexample_suffixes=cex_suffixes, count=True)
 				stop_time = process_time()
 				stop_perf = perf_counter()
 				total_time = stop_time - start_time
 				total_perf = stop_perf - start_perf
-				result_name = "Examples/benchmark/Results" + method + "/" + "".join(alph) + str(nstates) + "_" + str(i) + ".txt"
-				with open(result_name, "w") as result_file:
-					result_str = str(total_perf) + "\n" + str(total_time) + "\n" + str(len(result[0].weights)) + "\n" 
-					result_str += str(result[1]) + "\n" + str(result[2]) + "\n" + str(result[3]) + "\n" + str(result[4])
-					result_str += "\n"+ str(result[5])
-					result_file.write(str(result_str))
-				result_aut_name = "Examples/benchmark/Results" + method + "/" + "".join(alph) + str(nstates) + "_" + str(i) + "A.txt"
-				with open(result_aut_name, "w") as result_aut_file:
-					result_aut_file.write(str(result[0]))
+				append_result(make_record(method, alph, nstates, i, result, total_perf, total_time))
 				with open(progress_name, "w") as progress_file:
 					progress_file.write("".join(alph) + " " + str(nstates) + " " + str(i))
\ No newline at end of file
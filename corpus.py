@@ -0,0 +1,114 @@
+"""
+All benchmark automata in a single file, in the binary format of weighted_automaton.automaton_to_bytes
+The file is memory-mapped and only the index is read when it is opened, an automaton is decoded when it is asked for
+Layout: header (magic, number of automata, offset of the index), the automata, then the index with for every automaton
+its alphabet, number of states, index and the position of its bytes in the file
+generate_automaton computes a benchmark automaton from a seed instead of reading it from a corpus
+Example: python corpus.py converts Examples/benchmark/Automata/ into Examples/benchmark/automata.corpus
+"""
+import mmap
+import random
+import string
+import struct
+
+from weighted_automaton import automaton_to_bytes, automaton_from_bytes, load_automaton, random_automaton
+
+CORPUS_FILE = "Examples/benchmark/automata.corpus"
+MAGIC = b"WFAC"
+HEADER = struct.Struct("<4sIQ")
+ENTRY = struct.Struct("<IIQI") # nstates, i, offset, length (preceded by the alphabet as a length-prefixed string)
+
+def corpus_key(alph, nstates, i):
+	return ("".join(alph), nstates, i)
+
+def alphabets(letters):
+	"""
+	The alphabets of a sweep up to the given number of letters: ['a'], ['a', 'b'], ...
+	At most 26 letters, because jobs and records are named after the letters of their alphabet joined together
+	"""
+	if letters > len(string.ascii_lowercase):
+		raise ValueError("At most {0} letters are supported, not {1}".format(len(string.ascii_lowercase), letters))
+	return [list(string.ascii_lowercase[:k]) for k in range(1, letters + 1)]
+
+def generate_automaton(alph, nstates, i, seed=0, pos_weights=list(range(1, 5)), max_transitions=5):
+	"""
+	Benchmark automaton i with nstates states over alph, generated from the given seed
+	Its random number generator is seeded with the seed and the key, so the same automaton is generated every time,
+	independent of the other automata and of the global random state
+	"""
+	rng = random.Random("{0}/{1}/{2}/{3}".format(seed, "".join(alph), nstates, i))
+	return random_automaton(alphabet=list(alph), min_states=nstates, max_states=nstates, pos_weights=pos_weights,
+		max_transitions=max_transitions, rng=rng)
+
+def build_corpus(automata, filename=CORPUS_FILE):
+	"""Write a corpus with the automata, an iterable of ((alph, nstates, i), automaton)"""
+	index = []
+	with open(filename, "wb") as file:
+		file.write(HEADER.pack(MAGIC, 0, 0))
+		for key, aut in automata:
+			data = automaton_to_bytes(aut)
+			index.append((corpus_key(*key), file.tell(), len(data)))
+			file.write(data)
+		index_offset = file.tell()
+		for (alph, nstates, i), offset, length in index:
+			letters = alph.encode("utf-8")
+			file.write(struct.pack("<H", len(letters)) + letters + ENTRY.pack(nstates, i, offset, length))
+		file.seek(0)
+		file.write(HEADER.pack(MAGIC, len(index), index_offset))
+
+def corpus_from_directory(directory="Examples/benchmark/Automata/", filename=CORPUS_FILE,
+		alphabets=(['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'b', 'c', 'd']), sizes=range(1, 11), runs=range(1, 101)):
+	"""Convert the text files of the benchmark (one per automaton) into a corpus"""
+	build_corpus((((alph, nstates, i), load_automaton(directory + "".join(alph) + str(nstates) + "_" + str(i) + ".txt"))
+		for alph in alphabets for nstates in sizes for i in runs), filename)
+
+class Corpus:
+	"""
+	Read-only view of a corpus file: corpus.load(alph, nstates, i) or corpus[(alph, nstates, i)] decodes a single automaton
+	Opening a corpus maps the file into memory and reads the index, nothing else
+	"""
+	def __init__(self, filename=CORPUS_FILE):
+		self.file = open(filename, "rb")
+		self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, count, offset = HEADER.unpack_from(self.data, 0)
+		if magic != MAGIC:
+			raise ValueError(filename + " is not an automaton corpus")
+		self.index = {}
+		for _ in range(count):
+			(n, ) = struct.unpack_from("<H", self.data, offset)
+			alph = self.data[offset+2:offset+2+n].decode("utf-8")
+			nstates, i, start, length = ENTRY.unpack_from(self.data, offset+2+n)
+			self.index[(alph, nstates, i)] = (start, length)
+			offset += 2 + n + ENTRY.size
+
+	def load(self, alph, nstates, i):
+		start, length = self.index[corpus_key(alph, nstates, i)]
+		with memoryview(self.data) as view:
+			return automaton_from_bytes(view[start:start+length])
+
+	def __getitem__(self, key):
+		return self.load(*key)
+
+	def __contains__(self, key):
+		return corpus_key(*key) in self.index
+
+	def __len__(self):
+		return len(self.index)
+
+	def keys(self):
+		return self.index.keys()
+
+	def close(self):
+		self.data.close()
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+if __name__ == "__main__":
+	corpus_from_directory()
+	with Corpus() as corpus:
+		print(len(corpus), "automata written to", CORPUS_FILE)
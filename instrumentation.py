@@ -0,0 +1,84 @@
+"""
+Instrumentation hooks for the learners
+A learner reports every phase it runs (filling the table, a closedness check, create_machine, an equivalence query, ...)
+to the instrumentation object it was given. The default, NO_INSTRUMENTATION, ignores all reports
+Every call of a single-row closedness backend inside a closedness check is also timed, as the phase "backend call"
+"""
+from collections import defaultdict, Counter
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+class Instrumentation:
+	"""
+	Collects the reports of a learner:
+	phase(name): context manager timing one occurrence of the phase name
+	count(name, n): adds n to the counter name
+	record(name, value): adds value to the values of name, for example the size |S| x |E| of a closedness check
+	"""
+	def __init__(self):
+		self.times = defaultdict(float)
+		self.calls = defaultdict(int)
+		self.counts = defaultdict(int)
+		self.values = defaultdict(list)
+
+	@contextmanager
+	def phase(self, name):
+		start = perf_counter()
+		try:
+			yield
+		finally:
+			self.times[name] += perf_counter() - start
+			self.calls[name] += 1
+
+	def count(self, name, n=1):
+		self.counts[name] += n
+
+	def record(self, name, value):
+		self.values[name].append(value)
+
+	def count_run(self, membership_queries, closedness_checks, equivalence_queries):
+		"""The totals of a finished learning run"""
+		self.count("membership queries", membership_queries)
+		self.count("closedness checks", closedness_checks)
+		self.count("equivalence queries", equivalence_queries)
+
+	def wrap(self, name, function):
+		"""function, but every call is timed as the phase name"""
+		def timed(*args, **kwargs):
+			with self.phase(name):
+				return function(*args, **kwargs)
+		return timed
+
+	def histogram(self, name):
+		"""Counter mapping each value recorded for name to the number of times it was recorded"""
+		return Counter(self.values[name])
+
+	def report(self):
+		"""Summary of all phases, counters and recorded values"""
+		lines = []
+		for name in sorted(self.times, key=self.times.get, reverse=True):
+			lines.append("{0}: {1:.6f}s in {2} calls".format(name, self.times[name], self.calls[name]))
+		for name in sorted(self.counts):
+			lines.append("{0}: {1}".format(name, self.counts[name]))
+		for name in sorted(self.values):
+			lines.append("{0}: {1}".format(name, sorted(self.histogram(name).items())))
+		return "\n".join(lines)
+
+class NoInstrumentation:
+	"""Ignores all reports, the default for the learners"""
+	def phase(self, name):
+		return nullcontext()
+
+	def count(self, name, n=1):
+		pass
+
+	def record(self, name, value):
+		pass
+
+	def count_run(self, membership_queries, closedness_checks, equivalence_queries):
+		pass
+
+	def wrap(self, name, function):
+		return function
+
+NO_INSTRUMENTATION = NoInstrumentation()
@@ -0,0 +1,176 @@
+"""
+Exact integer lattice computations in pure Python
+Used as a native replacement for GAP's SolutionIntMat, so no interpreter round-trip is needed per query
+"""
+
+def _xgcd(a, b):
+	"""Return (g, x, y) such that a*x + b*y = g = gcd(a, b) and g >= 0"""
+	x0, y0, x1, y1 = 1, 0, 0, 1
+	while b:
+		q, a, b = a // b, b, a % b
+		x0, x1 = x1, x0 - q * x1
+		y0, y1 = y1, y0 - q * y1
+	if a < 0:
+		return -a, -x0, -y0
+	return a, x0, y0
+
+def _combine(x, u, y, v):
+	"""x*u + y*v for integer vectors u and v, where the shorter vector is padded with zeros"""
+	if len(u) < len(v):
+		u = u + [0] * (len(v) - len(u))
+	elif len(v) < len(u):
+		v = v + [0] * (len(u) - len(v))
+	return [x*a + y*b for a, b in zip(u, v)]
+
+def _pivot(v):
+	"""Index of the first nonzero entry of v, or None if v is zero"""
+	for i, a in enumerate(v):
+		if a != 0:
+			return i
+	return None
+
+def _insert_row(basis, row, trans):
+	"""
+	Insert row into basis, a list of [pivot, row, trans] in Hermite normal form ordered by pivot
+	trans keeps track of the combination of generators giving row
+	Returns trans if row reduces to zero (so trans is a relation between the generators), otherwise None
+	"""
+	while True:
+		p = _pivot(row)
+		if p is None:
+			return trans
+		i = 0
+		while i < len(basis) and basis[i][0] < p:
+			i += 1
+		if i == len(basis) or basis[i][0] > p:
+			if row[p] < 0:
+				row = [-a for a in row]
+				trans = [-a for a in trans]
+			basis.insert(i, [p, row, trans])
+			_reduce_above(basis, i)
+			return None
+		_, b, bt = basis[i]
+		g, x, y = _xgcd(b[p], row[p])
+		bp, rp = b[p] // g, row[p] // g
+		# The transformation [[x, y], [-rp, bp]] is unimodular, so the lattice stays the same
+		basis[i] = [p, _combine(x, b, y, row), _combine(x, bt, y, trans)]
+		row, trans = _combine(-rp, b, bp, row), _combine(-rp, bt, bp, trans)
+		_reduce_above(basis, i)
+
+def _reduce_row(basis, j, k):
+	"""Reduce the entry of basis[j] at the pivot of basis[k] modulo that pivot"""
+	p, b, bt = basis[k]
+	q = basis[j][1][p] // b[p]
+	if q != 0:
+		basis[j][1] = _combine(1, basis[j][1], -q, b)
+		basis[j][2] = _combine(1, basis[j][2], -q, bt)
+	return q
+
+def _reduce_above(basis, i):
+	"""
+	Restore the Hermite normal form after basis[i] changed: reduce basis[i] by the rows below it,
+	then the entries above its pivot, and again the rows that changed by the rows below basis[i]
+	"""
+	for k in range(i + 1, len(basis)):
+		_reduce_row(basis, i, k)
+	for j in range(i):
+		if _reduce_row(basis, j, i) != 0:
+			for k in range(i + 1, len(basis)):
+				_reduce_row(basis, j, k)
+
+def _solve(basis, v, ngens):
+	"""Solve x*M = v using the Hermite normal form basis of M, returns None if v is not in the lattice"""
+	v = list(v)
+	x = [0] * ngens
+	for p, b, bt in basis:
+		q, r = divmod(v[p], b[p])
+		if r != 0:
+			return None
+		if q != 0:
+			v = _combine(1, v, -q, b)
+			for i, c in enumerate(bt):
+				x[i] += q * c
+	if any(v):
+		return None
+	return x
+
+def hermite_normal_form(M):
+	"""
+	Row-style Hermite normal form of the integer matrix M (a list of rows)
+	Returns (H, U) such that U*M = H, where U is unimodular on the nonzero rows of H
+	Only the nonzero rows of H (and the corresponding rows of U) are returned
+	Example: hermite_normal_form([[2, 4], [3, 5]]) = ([[1, 1], [0, 2]], [[-1, 1], [3, -2]])
+	"""
+	basis = []
+	for i, row in enumerate(M):
+		trans = [0] * len(M)
+		trans[i] = 1
+		_insert_row(basis, list(row), trans)
+	return [b for _, b, _ in basis], [bt for _, _, bt in basis]
+
+def solution_int_mat(M, v):
+	"""
+	Pure Python version of GAP's SolutionIntMat
+	Return an integer vector x such that x*M = v, or None if no such vector exists
+	For example: solution_int_mat([[3, 1], [2, 4]], [5, 5]) = [1, 1]
+	"""
+	basis = []
+	for i, row in enumerate(M):
+		trans = [0] * len(M)
+		trans[i] = 1
+		_insert_row(basis, list(row), trans)
+	return _solve(basis, v, len(M))
+
+class IntegerLattice:
+	"""
+	Lattice spanned by a growing list of integer generators, kept in Hermite normal form
+	Generators can be appended with add_row, and entries can be appended to every generator with add_columns,
+	so the normal form never has to be recomputed from scratch when a table only grows
+	"""
+	def __init__(self, rows=None, width=0):
+		self.basis = [] # List of [pivot, row, trans], where trans gives row as a combination of the generators
+		self.relations = [] # Combinations of the generators that are zero on all current columns
+		self.ngens = 0
+		self.width = width
+		if rows is not None:
+			for row in rows:
+				self.add_row(row)
+
+	def add_row(self, row):
+		"""Add a generator, row must have one entry per column"""
+		row = list(row)
+		if self.ngens == 0 and self.width == 0:
+			self.width = len(row)
+		trans = [0] * (self.ngens + 1)
+		trans[self.ngens] = 1
+		self.ngens += 1
+		relation = _insert_row(self.basis, row, trans)
+		if relation is not None:
+			self.relations.append(relation)
+
+	def add_columns(self, columns):
+		"""Append columns, each column is a list with one entry per generator"""
+		columns = [list(c) for c in columns]
+		if not columns:
+			return
+		for b in self.basis:
+			b[1].extend(sum(c * col[i] for i, c in enumerate(b[2])) for col in columns)
+		relations, self.relations = self.relations, []
+		old_width = self.width
+		self.width += len(columns)
+		for trans in relations:
+			row = [0] * old_width + [sum(c * col[i] for i, c in enumerate(trans)) for col in columns]
+			relation = _insert_row(self.basis, row, trans)
+			if relation is not None:
+				self.relations.append(relation)
+
+	def solve(self, v):
+		"""Return x such that x times the generators is v, or None if v is not in the lattice"""
+		return _solve(self.basis, v, self.ngens)
+
+	def __contains__(self, v):
+		return self.solve(v) is not None
+
+	def __len__(self):
+		"""The rank of the lattice"""
+		return len(self.basis)
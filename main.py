@@ -1,29 +1,93 @@
 from collections import defaultdict
-from z3 import *
 
 from weighted_automaton import *
 from WLstar import *
 
+z3 = None # The z3 module, imported by load_z3 when a Z3 backend is first used
+
+def load_z3():
+	"""Import Z3 on first use, so importing this module does not load the solver"""
+	global z3
+	if z3 is None:
+		import z3
+	return z3
+
 def closed_by_z3(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=False):
-	if SxE is not None or txE is not None:
-		raise NotImplementedError("Supplying SxE and txE with arguments is not yet supported for Z3")
-	s = Solver()
-	xs = [Int(s) for s in S]
-	for e in E:
-		s.add(sum(membership_queries[s+e] * xs[i] for i,s in enumerate(S)) == membership_queries[t+e])
-	if s.check() == sat:
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	if txE is None:
+		txE = [membership_queries[t+e] for e in E]
+	load_z3()
+	s = z3.Solver()
+	xs = [z3.Int("x%d" % i) for i in range(len(SxE))]
+	for j in range(len(txE)):
+		s.add(sum(row[j] * xs[i] for i, row in enumerate(SxE)) == txE[j])
+	if s.check() == z3.sat:
 		m = s.model()
 		if verbose:
 			print("S:", S, '\nE:', E, '\nt:', t, "\nsat", m)
-		return [m[xs[i]].as_long() if m[xs[i]] is not None else 0 for i,s in enumerate(S)]
+		return [m[x].as_long() if m[x] is not None else 0 for x in xs]
 	else:
 		if verbose:
 			print(S, '\n', E, '\n', t, "\nunsat")
 		return False
 
+class IncrementalZ3(IncrementalBackend):
+	"""
+	Closedness backend with the same signature as closed_by_z3, which keeps a single Z3 solver for S x E between calls
+	Column j of the table is asserted once as y_j = SxE[0][j]*x_0 + ... + SxE[n-1][j]*x_{n-1} + z_j, where the tail z_j
+	is split as z_j = SxE[n][j]*x_n + z'_j when row n is added to S, so rows and columns only add assertions
+	A row t is checked in a push/pop scope asserting y_j = txE[j] and z_j = 0
+	Use a new instance for every learning run: check_closed=IncrementalZ3() (and check_closed_batch=backend.batch)
+	"""
+	name = "Z3"
+	fallback = staticmethod(closed_by_z3)
+
+	def reset(self, width):
+		load_z3()
+		self.solver = z3.Solver()
+		self.xs = []
+		self.ys = [z3.Int("y%d" % j) for j in range(width)]
+		self.tails = list(self.ys) # Without rows, y_j is its own tail
+
+	def add_row(self, row):
+		n = len(self.xs)
+		x = z3.Int("x%d" % n)
+		for j, w in enumerate(row):
+			z = z3.Int("z%d_%d" % (j, n + 1))
+			self.solver.add(self.tails[j] == w * x + z)
+			self.tails[j] = z
+		self.xs.append(x)
+
+	def add_columns(self, columns):
+		n = len(self.xs)
+		for column in columns:
+			j = len(self.ys)
+			y = z3.Int("y%d" % j)
+			z = z3.Int("z%d_%d" % (j, n))
+			self.solver.add(y == sum(w * x for w, x in zip(column, self.xs)) + z)
+			self.ys.append(y)
+			self.tails.append(z)
+
+	def solve(self, txE):
+		self.solver.push()
+		for y, z, w in zip(self.ys, self.tails, txE):
+			self.solver.add(y == w, z == 0)
+		result = None
+		if self.solver.check() == z3.sat:
+			m = self.solver.model()
+			result = [m.eval(x, model_completion=True).as_long() for x in self.xs]
+		self.solver.pop()
+		return result
+
+def closed_by_z3_batch(wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+	"""Batch version of closed_by_z3 (see closed_by_rows): all rows of T are checked with push/pop on one solver for S x E"""
+	return IncrementalZ3().batch(wfa, S, E, T, membership_queries, SxE=SxE, TxE=TxE, first=first, verbose=verbose)
+
 if __name__ == "__main__": #load("Examples/13o.txt")
 	#aut = random_automaton(alphabet=['a', 'b'], min_states=5, max_states=5, pos_weights=list(range(1, 5)), min_transitions=5) 
 	aut = load_automaton("Examples/38o.txt")
 	print(aut)
-	res = weighted_Lstar(aut, check_closed=closed_by_z3, check_counterexample=random_counterexample, verbose=False, count=True)
+	backend = IncrementalZ3()
+	res = weighted_Lstar(aut, check_closed=backend, check_counterexample=random_counterexample, check_closed_batch=backend.batch, verbose=False, count=True)
 	compare_machines(aut, res[0], prover=random_counterexample)
\ No newline at end of file
@@ -1,15 +1,17 @@
 from weighted_automaton import *
-from WLstar import random_counterexample
-from sage_main import closed_by_gap, modified_weighted_Lstar, minimal_weighted_Lstar, HKC
+from WLstar import random_counterexample, all_suffixes, rivest_schapire
+import backends
+from results_store import make_record, append_result
 
 from time import perf_counter, process_time
 
 if __name__ == "__main__":
 	method = "GapHKC"
 	version = "Basis/"
-	closed = closed_by_gap
-	#counterexample = random_counterexample
-	counterexample = HKC
+	closed = backends.closedness("gap")
+	#counterexample = backends.equivalence("random_counterexample")
+	counterexample = backends.equivalence("HKC")
+	cex_suffixes = all_suffixes #Use rivest_schapire (and a different method name) to add a single suffix per counterexample
 
 	progress_name = "Examples/benchmark/Results" + method + version + "progress.txt"
 	with open(progress_name, "r") as progress_file:
@@ -29,7 +31,7 @@ if __name__ == "__main__":
 				aut = load_automaton(filename=aut_file)
 				start_time = process_time()
 				start_perf = perf_counter()
-				result = minimal_weighted_Lstar(aut, check_closed=closed, check_counterexample=counterexample)
+				result = backends.learner("minimal_weighted_Lstar")(aut, check_closed=closed, check_counterexample=counterexample, counterexample_suffixes=cex_suffixes)
 				stop_time = process_time()
 				stop_perf = perf_counter()
 				total_time = stop_time - start_time
@@ -40,14 +42,6 @@ if __name__ == "__main__":
 				if len(result[0].weights) > len(aut.weights):
 					print(alph, nstates, i, "result not minimal, result & target:", len(result[0].weights), len(aut.weights))
 					raise Exception
-				result_name = "Examples/benchmark/Results" + method + version + "".join(alph) + str(nstates) + "_" + str(i) + ".txt"
-				result_str = str(total_perf) + "\n" + str(total_time) + "\n" + str(len(result[0].weights)) + "\n" 
-				result_str += str(result[1]) + "\n" + str(result[2]) + "\n" + str(result[3]) + "\n" + str(result[4])
-				result_str += "\n" + str(float(result[5]))
-				with open(result_name, "w") as result_file:
-					result_file.write(str(result_str))
-				result_aut_name = "Examples/benchmark/Results" + method + version + "".join(alph) + str(nstates) + "_" + str(i) + "A.txt"
-				with open(result_aut_name, "w") as result_aut_file:
-					result_aut_file.write(str(result[0]))
+				append_result(make_record(method + version.strip("/"), alph, nstates, i, result, total_perf, total_time))
 				with open(progress_name, "w") as progress_file:
 					progress_file.write("".join(alph) + " " + str(nstates) + " " + str(i))
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Linear independence tests modulo machine-word primes
+Used as a cheap prefilter for closedness: if t x E is independent of the rows of S x E modulo p,
+it is also independent over the rationals, so it is certainly not an integer combination of S x E
+The rows are reduced as int64 arrays when NumPy is available, otherwise as lists of Python integers
+"""
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# Primes below 2^31, so a product of two residues (and the difference of two such products) fits in an int64
+PRIMES = (2147483647, 2147483629, 2147483587)
+
+def _residues(rows, width, p):
+	"""rows modulo p, as an int64 array if NumPy is available"""
+	rows = [[x % p for x in row] for row in rows]
+	if np is not None:
+		return np.array(rows, dtype=np.int64).reshape(len(rows), width)
+	return rows
+
+def _reduce_rows(V, basis, p):
+	"""Reduce every row of V modulo p by the echelon basis, a list of (pivot, row) with row[pivot] == 1"""
+	if np is not None:
+		for k, b in basis:
+			V = (V - V[:, k:k+1] * b) % p
+		return V
+	for k, b in basis:
+		V = [[(x - v[k]*y) % p for x, y in zip(v, b)] if v[k] else v for v in V]
+	return V
+
+def _echelon(rows, width, p):
+	"""Echelon basis of rows modulo p, or None if the rows are linearly dependent modulo p"""
+	basis = []
+	for v in _residues(rows, width, p):
+		v = _reduce_rows(v[None, :] if np is not None else [v], basis, p)[0]
+		k = next((i for i, x in enumerate(v) if x != 0), None)
+		if k is None:
+			return None
+		inverse = pow(int(v[k]), p - 2, p)
+		basis.append((k, (v * inverse) % p if np is not None else [x * inverse % p for x in v]))
+	return basis
+
+def independent_rows(M, V, width, primes=PRIMES):
+	"""
+	For every row v of V, True if v is proven to be linearly independent of the rows of M over the rationals:
+	the rows of M are independent modulo p (the first of primes for which this holds), and v does not reduce to zero modulo p
+	False means v may be in the span, or the rows of M are not independent modulo any of the primes
+	"""
+	for p in primes:
+		basis = _echelon(M, width, p)
+		if basis is not None:
+			R = _reduce_rows(_residues(V, width, p), basis, p)
+			if np is not None:
+				return [bool(x) for x in R.any(axis=1)]
+			return [any(r) for r in R]
+	return [False] * len(V)
@@ -0,0 +1,132 @@
+from weighted_automaton import *
+from WLstar import *
+from lattice import solution_int_mat, IntegerLattice
+from modular import independent_rows, PRIMES
+from rational import RationalSpan, integer_vector
+from words import EPSILON, codes
+from collections import deque
+
+def closed_by_hnf(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=False):
+	"""
+	Native replacement for closed_by_gap, using a Hermite normal form instead of GAP's SolutionIntMat
+	Return the integer linear combination of the rows of S x E giving t x E, or False if it does not exist
+	"""
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	if txE is None:
+		txE = [membership_queries[t+e] for e in E]
+	result = solution_int_mat(SxE, txE)
+	if result is None:
+		if verbose:
+			print("HNF: Fail, len S/len E:", len(S), len(E), "t:", t)
+		return False
+	return result
+
+def closed_by_hnf_batch(wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+	"""
+	Batch version of closed_by_hnf (see closed_by_rows): the Hermite normal form of S x E is computed once
+	and every row of T is a single reduction against it
+	"""
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	lattice = IntegerLattice(SxE, width=len(E))
+	return solve_rows(lattice.solve, "HNF", S, E, T, membership_queries, TxE, first, verbose)
+
+def tzeng(wfa, model, membership_queries, verbose=False):
+	"""
+	Equivalence query without GAP (Tzeng's algorithm): explores the words breadth-first, together with the forward vectors of wfa
+	and model placed side by side. A word is only extended if its vector is not in the rational span of the vectors kept so far,
+	so at most len(wfa.weights) + len(model.weights) vectors are kept and at most that many times the size of the alphabet words
+	are tried. Returns a shortest counterexample, or None if wfa and model are equivalent
+	"""
+	if verbose:
+		print("Running Tzeng's algorithm to find a counterexample.")
+	span = RationalSpan(width=len(wfa.weights) + len(model.weights))
+	todo = deque([(EPSILON, wfa.initial, model.initial)])
+	alphabet = codes(wfa.alphabet)
+	while todo:
+		w, v1, v2 = todo.popleft()
+		if sum(a*b for a, b in zip(v1, wfa.weights)) != sum(a*b for a, b in zip(v2, model.weights)):
+			if verbose:
+				print("Found counterexample:", w)
+			return w
+		v = integer_vector(list(v1) + list(v2))
+		if v not in span:
+			span.add_row(v)
+			for a in alphabet:
+				todo.append((w + a, wfa.next_distribution(v1, a), model.next_distribution(v2, a)))
+	if verbose:
+		print("No counterexample found")
+	return None
+
+class IncrementalHNF(IncrementalBackend):
+	"""
+	Closedness backend with the same signature as closed_by_hnf, which keeps the Hermite normal form of S x E between calls
+	When rows are appended to S or columns are appended to E, the normal form is updated instead of recomputed,
+	so checking a row t is a single reduction against the cached form
+	The method batch is the matching batch check: check_closed=backend, check_closed_batch=backend.batch
+	If the table changed in any other way (for example, a row was rescaled by its GCD), the form is rebuilt
+	Use a new instance for every learning run: check_closed=IncrementalHNF()
+	"""
+	name = "HNF"
+	fallback = staticmethod(closed_by_hnf)
+
+	def reset(self, width):
+		self.lattice = IntegerLattice(width=width)
+
+	def add_row(self, row):
+		self.lattice.add_row(row)
+
+	def add_columns(self, columns):
+		self.lattice.add_columns(columns)
+
+	def solve(self, txE):
+		return self.lattice.solve(txE)
+
+class ModularPrefilter:
+	"""
+	Batch closedness backend that first tests all rows of T modulo machine-word primes (see modular.py)
+	Rows that are independent of S x E modulo a prime are rejected without calling the exact backend,
+	all other rows are given to check_closed_batch, the exact batch backend (GAP, native or Bareiss)
+	Use it as check_closed_batch=ModularPrefilter(closed_by_gap_batch)
+	rejected and escalated count the rows answered by the prefilter and by the exact backend
+	"""
+	def __init__(self, check_closed_batch, primes=PRIMES):
+		self.check_closed_batch = check_closed_batch
+		self.primes = primes
+		self.rejected = 0
+		self.escalated = 0
+
+	def __call__(self, wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+		if SxE is None:
+			SxE = [[membership_queries[s+e] for e in E] for s in S]
+		if TxE is None:
+			TxE = [[membership_queries[t+e] for e in E] for t in T]
+		independent = independent_rows(SxE, TxE, len(E), self.primes)
+		if first and any(independent):
+			k = independent.index(True) # Only the rows before the first rejected row have to be checked exactly
+			T, TxE, independent = T[:k+1], TxE[:k+1], independent[:k+1]
+		rows = [i for i, x in enumerate(independent) if not x]
+		self.escalated += len(rows)
+		exact = self.check_closed_batch(wfa, S, E, [T[i] for i in rows], membership_queries, SxE=SxE,
+			TxE=[TxE[i] for i in rows], first=first, verbose=verbose) if rows else {}
+		result = {}
+		for t, x in zip(T, independent):
+			if x:
+				if verbose:
+					print("Modular: Fail, len S/len E:", len(S), len(E), "t:", t)
+				self.rejected += 1
+				result[t] = False
+			elif t in exact:
+				result[t] = exact[t]
+			else:
+				break # The exact backend stopped at an earlier row
+			if first and result[t] is False:
+				break
+		return result
+
+if __name__ == "__main__":
+	aut = load_automaton("Examples/38o.txt")
+	print(aut)
+	res = weighted_Lstar(aut, check_closed=IncrementalHNF(), check_counterexample=random_counterexample, verbose=False, count=True)
+	compare_machines(aut, res[0], prover=random_counterexample)
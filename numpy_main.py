@@ -0,0 +1,79 @@
+import numpy as np
+
+from weighted_automaton import *
+from WLstar import *
+from words import word
+
+INT64_BOUND = 2**62 # Values below this bound can be added without overflowing an int64
+
+def stacked_matrices(wfa, model):
+	"""
+	The transition matrices of wfa and model for every letter, as one block diagonal matrix (with object dtype, so exact)
+	A single row vector (u, v) then holds the distribution u of wfa and the distribution v of model
+	"""
+	n = len(wfa.weights)
+	size = n + len(model.weights)
+	matrices = {a: np.zeros((size, size), dtype=object) for a in wfa.alphabet}
+	for offset, aut in ((0, wfa), (n, model)):
+		for (q0, a), targets in aut.transitions.items():
+			for q1, w in targets:
+				matrices[a][offset+q0, offset+q1] += w
+	return matrices
+
+class RandomTester:
+	"""
+	Random equivalence query (like random_counterexample) which tests many random words at once
+	Every call samples a number of random words (words) of length max_length (by default 2 * |alphabet| * |states| + 3,
+	the longest word random_counterexample tries) and follows all of them in wfa and model together, one letter at a time,
+	as the rows of one matrix multiplied by the stacked transition matrices. All prefixes are tested, so the result
+	is the shortest counterexample among the prefixes of the sampled words (or None if there is none)
+	The rows are int64 while no overflow is possible, and exact Python numbers (object dtype) after that
+	The words come from a seeded generator: use a new instance for every learning run, check_counterexample=RandomTester(seed=1)
+	"""
+	def __init__(self, words=1000, max_length=None, seed=0):
+		self.words = words
+		self.max_length = max_length
+		self.rng = np.random.default_rng(seed)
+
+	def __call__(self, wfa, model, membership_queries, verbose=False):
+		if verbose:
+			print("Trying", self.words, "random words to find a counterexample.")
+		alphabet = wfa.alphabet
+		length = self.max_length if self.max_length is not None else 2*len(alphabet)*len(wfa.weights) + 3
+		letters = self.rng.integers(len(alphabet), size=(self.words, length))
+		matrices = stacked_matrices(wfa, model)
+		initial = list(wfa.initial) + list(model.initial)
+		final = np.array(list(wfa.weights) + [-w for w in model.weights], dtype=object)
+		V = np.tile(np.array(initial, dtype=object), (self.words, 1))
+		exact = all(type(x) is int for x in initial + list(final)) and all(type(x) is int for M in matrices.values() for x in M.flat)
+		if exact:
+			# Bound on the entries of V: every letter multiplies it by at most the largest absolute column sum
+			bound = max([abs(x) for x in initial] + [1])
+			growth = max([sum(abs(x) for x in column) for M in matrices.values() for column in M.T] + [1])
+			total = max(sum(abs(x) for x in final), 1)
+			exact = bound * growth * total < INT64_BOUND # Also false if an entry does not fit in an int64 at all
+		if exact:
+			V, final = V.astype(np.int64), final.astype(np.int64)
+			matrices = {a: M.astype(np.int64) for a, M in matrices.items()}
+		for k in range(length + 1):
+			if exact and bound * growth * total >= INT64_BOUND:
+				exact = False
+				V, final = V.astype(object), final.astype(object)
+				matrices = {a: M.astype(object) for a, M in matrices.items()}
+			failing = np.flatnonzero(V.dot(final) != 0)
+			if failing.size:
+				cex = word([alphabet[i] for i in letters[failing[0], :k]])
+				if cex not in membership_queries:
+					membership_queries[cex] = wfa.member(cex)
+				if verbose:
+					print("Found counterexample:", cex)
+				return cex
+			if k < length:
+				for i, a in enumerate(alphabet):
+					rows = letters[:, k] == i
+					V[rows] = V[rows].dot(matrices[a])
+				if exact:
+					bound *= growth
+		if verbose:
+			print("No counterexample found")
+		return None
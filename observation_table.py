@@ -0,0 +1,123 @@
+from words import EPSILON
+
+class OrderedSet:
+	"""
+	List of distinct elements with constant time membership tests and index lookups
+	Used for S and E, so t in S, S.index(t) and e not in E do not scan the list
+	"""
+	def __init__(self, items=()):
+		self.items = []
+		self.positions = {}
+		self.extend(items)
+
+	def append(self, x):
+		if x not in self.positions:
+			self.positions[x] = len(self.items)
+			self.items.append(x)
+
+	def extend(self, xs):
+		for x in xs:
+			self.append(x)
+
+	def index(self, x):
+		return self.positions[x]
+
+	def __contains__(self, x):
+		return x in self.positions
+
+	def __delitem__(self, i):
+		del self.positions[self.items.pop(i)]
+		for j, x in enumerate(self.items):
+			self.positions[x] = j
+
+	def __getitem__(self, i):
+		return self.items[i]
+
+	def __iter__(self):
+		return iter(self.items)
+
+	def __reversed__(self):
+		return reversed(self.items)
+
+	def __len__(self):
+		return len(self.items)
+
+	def __add__(self, other):
+		return self.items + list(other)
+
+	def __eq__(self, other):
+		return self.items == list(other)
+
+	def __repr__(self):
+		return repr(self.items)
+
+class ObservationTable:
+	"""
+	Observation table of a learner, with rows indexed by words (S, SA, ...) and columns indexed by E
+	S and E are ordered sets, the entries are kept per row in a list that grows when E grows,
+	so an entry is looked up by position instead of building and hashing the word s+e
+	The rows are lists of Python numbers rather than typed arrays: the weights grow beyond 64 bits (and are fractions
+	for the rational learner), and reading from a typed array would convert every entry to a Python number anyway
+	queries is the dictionary of all membership queries (the old membership_queries), shared between rows,
+	it is also the dictionary given to the closedness and equivalence backends
+	"""
+	def __init__(self, wfa, S=(EPSILON,), E=(EPSILON,), queries=None):
+		self.wfa = wfa
+		self.S = OrderedSet(S)
+		self.E = OrderedSet(E)
+		self.queries = {} if queries is None else queries
+		self.row_index = {}
+		self.data = [] # data[row_index[r]][j] is the weight of r + E[j], rows are only filled up to the known columns
+
+	def query(self, word):
+		"""The weight of a single word, asking wfa only if it was not asked before"""
+		if word not in self.queries:
+			self.queries[word] = self.wfa.member(word)
+		return self.queries[word]
+
+	def query_batch(self, words):
+		"""Add the weights of all words that are not in queries yet, using a single batched call to wfa"""
+		words = [w for w in words if w not in self.queries]
+		if words:
+			self.queries.update(zip(words, self.wfa.member_batch(words)))
+
+	def fill(self, rows):
+		"""
+		Make sure the entries of all rows are known for every column in E
+		If wfa can compute tables directly (wfa.member_table), the missing rows and columns are computed as one
+		product of forward and backward vectors, otherwise the missing words are asked in a single batched call
+		"""
+		missing = [] # (row, the words r+c of its missing columns), every word is built once
+		unknown = {} # (r, c) to r+c for the words that are not in queries yet
+		for r in rows:
+			if r not in self.row_index:
+				self.row_index[r] = len(self.data)
+				self.data.append([])
+			row = self.data[self.row_index[r]]
+			if len(row) < len(self.E):
+				words = []
+				for c in self.E[len(row):]:
+					word = r+c
+					words.append(word)
+					if word not in self.queries:
+						unknown[(r, c)] = word
+				missing.append((row, words))
+		if unknown and hasattr(self.wfa, "member_table"):
+			rows = list(dict.fromkeys(r for r, c in unknown))
+			columns = list(dict.fromkeys(c for r, c in unknown))
+			for r, table_row in zip(rows, self.wfa.member_table(rows, columns)):
+				for c, w in zip(columns, table_row):
+					word = unknown.get((r, c))
+					if word is not None:
+						self.queries.setdefault(word, w)
+		elif unknown:
+			self.query_batch(unknown.values())
+		for row, words in missing:
+			row.extend(self.queries[word] for word in words)
+
+	def row(self, r):
+		"""The entries of row r for the columns in E, in the order of E (fill the row first, do not modify the result)"""
+		return self.data[self.row_index[r]]
+
+	def value(self, r, e):
+		return self.data[self.row_index[r]][self.E.index(e)]
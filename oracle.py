@@ -0,0 +1,211 @@
+"""
+Black-box targets: the weighted automaton to learn is an external system which only answers membership queries
+BlackBoxOracle can be given to the learners instead of a Weighted_Automaton. The observation table asks all missing
+entries of a round with one call to member_batch, which is split into batches that are sent to the system over a
+stream (the pipes of a subprocess or a socket), with up to in_flight batches waiting for an answer at the same time
+Protocol: one JSON object per line. A request is {"id": n, "words": [[letter, ...], ...]}, the answer
+is {"id": n, "weights": [...]}, with rational weights as strings (see results_store.weight_to_json).
+Answers can come in any order
+Running this file is a local stand-in for such a system, which answers the queries with an automaton from a file:
+python oracle.py Examples/38o.txt (on stdin/stdout) or python oracle.py Examples/38o.txt --port 5000 (on a socket)
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+from weighted_automaton import load_automaton
+from results_store import weight_to_json, weight_from_json
+from words import word, letters
+
+LINE_LIMIT = 2**26 # Longest request or answer line in bytes (asyncio streams allow 64 KiB by default)
+
+class BlackBoxOracle:
+	"""
+	Membership oracle for a system behind a stream, with the interface of a Weighted_Automaton that the learners use:
+	alphabet, member(word) and member_batch(words)
+	connect is a coroutine function returning (reader, writer) asyncio streams, see subprocess_oracle and socket_oracle
+	The words of a call are sent in batches of batch_size, at most in_flight batches are waiting for an answer
+	The equivalence queries need a teacher which only uses membership queries, like RandomWordsTeacher
+	"""
+	def __init__(self, alphabet, connect, batch_size=256, in_flight=8):
+		self.alphabet = list(alphabet)
+		self.connect = connect
+		self.batch_size = batch_size
+		self.in_flight = in_flight
+		self.loop = asyncio.new_event_loop()
+		self.reader = None
+		self.writer = None
+		self.process = None # Set by subprocess_oracle, waited for when the oracle is closed
+		self.pending = {} # Batch id to the future of its weights
+		self.next_id = 0
+		self.queries = 0
+		self.batches = 0
+
+	async def open(self):
+		if self.writer is None:
+			self.reader, self.writer = await self.connect()
+
+	async def receive(self):
+		"""
+		Give every answer to the batch waiting for it, runs until it is cancelled
+		If the connection is closed or an answer cannot be read, every waiting batch gets the error
+		Answers with an unknown id are skipped: they are late answers to batches of an earlier call that failed
+		"""
+		try:
+			while True:
+				line = await self.reader.readline()
+				if not line:
+					raise ConnectionError("The oracle closed the connection with " + str(len(self.pending)) + " batches unanswered")
+				answer = json.loads(line)
+				result = self.pending.pop(answer["id"], None)
+				if result is not None:
+					result.set_result([weight_from_json(w) for w in answer["weights"]])
+		except Exception as error:
+			for result in self.pending.values():
+				result.set_exception(error)
+			self.pending.clear()
+
+	async def send(self, words, slots):
+		async with slots:
+			batch_id = self.next_id
+			self.next_id += 1
+			result = self.pending[batch_id] = self.loop.create_future()
+			try:
+				self.writer.write((json.dumps({"id": batch_id, "words": [letters(w) for w in words]}) + "\n").encode("utf-8"))
+				await self.writer.drain()
+				self.batches += 1
+				return await result
+			finally:
+				self.pending.pop(batch_id, None)
+
+	async def ask(self, words):
+		await self.open()
+		slots = asyncio.Semaphore(self.in_flight)
+		batches = [words[i:i+self.batch_size] for i in range(0, len(words), self.batch_size)]
+		sending = [asyncio.ensure_future(self.send(batch, slots)) for batch in batches]
+		receiving = asyncio.ensure_future(self.receive())
+		try:
+			results = await asyncio.gather(*sending)
+		finally:
+			# If a batch failed, the others are cancelled, so none of them stays in pending
+			for task in sending + [receiving]:
+				task.cancel()
+			await asyncio.gather(*sending, receiving, return_exceptions=True)
+		return [w for weights in results for w in weights]
+
+	def member_batch(self, words):
+		"""The weights of all words, in the same order"""
+		words = list(words)
+		if not words:
+			return []
+		self.queries += len(words)
+		return self.loop.run_until_complete(self.ask(words))
+
+	def member(self, word, verbose=False):
+		weight = self.member_batch([word])[0]
+		if verbose:
+			print(word, weight)
+		return weight
+
+	async def shutdown(self):
+		self.writer.close()
+		await self.writer.wait_closed()
+		if self.process is not None:
+			await self.process.wait()
+
+	def close(self):
+		"""Close the connection (a subprocess stops when its input is closed)"""
+		if self.writer is not None:
+			self.loop.run_until_complete(self.shutdown())
+			self.writer = None
+		self.loop.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def subprocess_oracle(alphabet, command, **kwargs):
+	"""Oracle for a program which reads requests on stdin and writes the answers on stdout, command is a list of arguments"""
+	async def connect():
+		oracle.process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+			limit=LINE_LIMIT)
+		return oracle.process.stdout, oracle.process.stdin
+	oracle = BlackBoxOracle(alphabet, connect, **kwargs)
+	return oracle
+
+def socket_oracle(alphabet, host, port, **kwargs):
+	"""Oracle for a server listening on host:port"""
+	return BlackBoxOracle(alphabet, lambda: asyncio.open_connection(host, port, limit=LINE_LIMIT), **kwargs)
+
+def standin_oracle(filename, latency=0, **kwargs):
+	"""Oracle for the automaton in filename, answered by this file in a subprocess which waits latency seconds per batch"""
+	alphabet = load_automaton(filename).alphabet
+	return subprocess_oracle(alphabet, [sys.executable, __file__, filename, "--latency", str(latency)], **kwargs)
+
+class RandomWordsTeacher:
+	"""
+	Equivalence query which only uses membership queries, for black-box targets
+	Every call compares the model with the target on a number of random words (words) of length 0 up to max_length,
+	all asked with one call to member_batch, and returns the shortest word on which they differ (or None)
+	"""
+	def __init__(self, words=1000, max_length=10, seed=0):
+		self.words = words
+		self.max_length = max_length
+		self.rng = random.Random(seed)
+
+	def __call__(self, wfa, model, membership_queries, verbose=False):
+		sample = dict.fromkeys(word(self.rng.choices(wfa.alphabet, k=self.rng.randint(0, self.max_length))) for _ in range(self.words))
+		missing = [w for w in sample if w not in membership_queries]
+		membership_queries.update(zip(missing, wfa.member_batch(missing)))
+		for w in sorted(sample, key=len):
+			if membership_queries[w] != model.member(w):
+				if verbose:
+					print("Found counterexample:", w)
+				return w
+		return None
+
+async def serve(aut, reader, writer, latency=0):
+	"""Answer the requests on reader with the weights in aut, each batch is answered latency seconds after it arrives"""
+	async def answer(request):
+		await asyncio.sleep(latency)
+		weights = aut.member_batch(request["words"])
+		writer.write((json.dumps({"id": request["id"], "weights": [weight_to_json(w) for w in weights]}) + "\n").encode("utf-8"))
+		await writer.drain()
+	answers = []
+	while True:
+		line = await reader.readline()
+		if not line:
+			break
+		answers.append(asyncio.ensure_future(answer(json.loads(line))))
+	await asyncio.gather(*answers)
+	writer.close()
+
+async def serve_stdio(aut, latency=0):
+	loop = asyncio.get_running_loop()
+	reader = asyncio.StreamReader(limit=LINE_LIMIT)
+	await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+	transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+	writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+	await serve(aut, reader, writer, latency)
+
+async def serve_socket(aut, port, latency=0):
+	server = await asyncio.start_server(lambda reader, writer: serve(aut, reader, writer, latency), "localhost", port,
+		limit=LINE_LIMIT)
+	async with server:
+		await server.serve_forever()
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Answer membership queries with an automaton (a stand-in for a black-box system)")
+	parser.add_argument("automaton", help="File with the automaton (see load_automaton)")
+	parser.add_argument("--port", type=int, default=None, help="Listen on this port instead of using stdin/stdout")
+	parser.add_argument("--latency", type=float, default=0, help="Seconds to wait before answering a batch")
+	args = parser.parse_args()
+	aut = load_automaton(args.automaton)
+	if args.port is None:
+		asyncio.run(serve_stdio(aut, args.latency))
+	else:
+		asyncio.run(serve_socket(aut, args.port, args.latency))
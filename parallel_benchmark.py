@@ -0,0 +1,161 @@
+"""
+Runs the benchmark (4 alphabets x 10 sizes x 100 automata) on a pool of worker processes
+Every finished job is appended as a record to the results store (see results_store.py),
+so an interrupted sweep continues where it stopped
+A job that times out gets a record with status "timeout" and is not run again, a job that raises an exception
+gets a record with status "error" and is run again when the sweep is resumed
+With --generate the automata are generated from a seed instead of read from disk, for sweeps of any size
+Example: python parallel_benchmark.py --method GapHKC --learner weighted_Lstar --teacher HKC --timeout 600
+Example: python parallel_benchmark.py --method HNF20 --closed hnf --teacher tzeng --generate 1 --letters 6 --states 20 --runs 10
+"""
+from multiprocessing import Pool, cpu_count
+from multiprocessing.util import Finalize
+import argparse
+import random
+import signal
+
+from weighted_automaton import *
+from WLstar import all_suffixes, rivest_schapire
+import backends
+from results_store import RESULTS_FILE, make_record, append_result, load_results
+from instrumentation import Instrumentation, NO_INSTRUMENTATION
+from corpus import Corpus, generate_automaton, alphabets
+from query_cache import QueryCache, CachedTarget
+
+from time import perf_counter, process_time
+
+ALPHABETS = (['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'b', 'c', 'd'])
+LEARNER_KWARGS = {"weighted_Lstar": {"count": True}, "modified_weighted_Lstar": {"count": True}, "minimal_weighted_Lstar": {}}
+# The backends are resolved by name in the workers (see backends.py), so Sage/GAP and Z3 are only loaded by jobs that use them
+SUFFIXES = {"all_suffixes": all_suffixes, "rivest_schapire": rivest_schapire}
+
+class JobTimeout(Exception):
+	pass
+
+def raise_timeout(signum, frame):
+	raise JobTimeout()
+
+def job_name(alph, nstates, i):
+	return "".join(alph) + str(nstates) + "_" + str(i)
+
+def all_jobs(alphabets=ALPHABETS, sizes=range(1, 11), runs=range(1, 101)):
+	return [(alph, nstates, i) for alph in alphabets for nstates in sizes for i in runs]
+
+corpora = {} #Corpus files opened by this worker process, each is opened (memory-mapped) once
+caches = {} #Query caches opened by this worker process
+
+def close_caches():
+	"""Close the query caches of this worker, which writes the last-use times of the hits since their last store"""
+	for cache in caches.values():
+		cache.close()
+	caches.clear()
+
+def start_worker():
+	# Pool workers leave with os._exit, which skips atexit handlers, but finalizers run when a worker stops normally
+	Finalize(None, close_caches, exitpriority=10)
+
+def load_job(alph, nstates, i, corpus=None, generate=None):
+	"""
+	The automaton of a job: generated with seed generate if it is given (see corpus.generate_automaton),
+	otherwise from the corpus file if one is given, otherwise from its own text file
+	"""
+	if generate is not None:
+		return generate_automaton(alph, nstates, i, seed=generate)
+	if corpus is None:
+		return load_automaton(filename="Examples/benchmark/Automata/" + job_name(alph, nstates, i) + ".txt")
+	if corpus not in corpora:
+		corpora[corpus] = Corpus(corpus)
+	return corpora[corpus].load(alph, nstates, i)
+
+FINISHED = ("done", "invalid", "timeout") # Statuses of jobs that are not run again, failed jobs ("error") are retried
+
+def read_done(method, filename=RESULTS_FILE):
+	"""The names of all jobs of method that have a finished record in the store"""
+	return set(r["alphabet"] + str(r["nstates"]) + "_" + str(r["index"]) for r in load_results(filename, method=method)
+		if r["status"] in FINISHED)
+
+def run_job(args):
+	"""Learn a single benchmark automaton and return (job, record)"""
+	job, options = args
+	alph, nstates, i = job
+	name = job_name(alph, nstates, i)
+	settings = {k: options.get(k) for k in ("learner", "teacher", "closed", "suffixes", "batch", "prefilter", "generate")}
+	random.seed(name) #Random teachers give the same results no matter which worker runs the job
+	instrument = Instrumentation() if options.get("profile") else NO_INSTRUMENTATION
+	cache = None
+	if options["timeout"]:
+		signal.signal(signal.SIGALRM, raise_timeout)
+		signal.alarm(options["timeout"])
+	try:
+		learner = backends.learner(options["learner"])
+		backend = backends.closedness(options["closed"]) #New instance for every job if the backend is incremental
+		batch = backends.batch(options["closed"], backend) if options.get("batch") or options.get("prefilter") else None
+		if options.get("prefilter"):
+			from native_main import ModularPrefilter
+			batch = ModularPrefilter(batch)
+		aut = load_job(alph, nstates, i, options.get("corpus"), options.get("generate"))
+		if options.get("cache"):
+			if options["cache"] not in caches:
+				caches[options["cache"]] = QueryCache(options["cache"])
+			cache = caches[options["cache"]]
+			hits, misses = cache.hits, cache.misses
+			aut = CachedTarget(aut, cache)
+		start_time = process_time()
+		start_perf = perf_counter()
+		result = learner(aut, check_closed=backend, check_counterexample=backends.equivalence(options["teacher"]),
+			counterexample_suffixes=SUFFIXES[options["suffixes"]], check_closed_batch=batch, instrument=instrument, **LEARNER_KWARGS[options["learner"]])
+		stop_time = process_time()
+		stop_perf = perf_counter()
+	except JobTimeout:
+		return job, make_record(options["method"], alph, nstates, i, None, None, None, status="timeout", **settings)
+	except Exception as error: #One failing job (a missing dependency, a bug in a learner) does not stop the sweep
+		return job, make_record(options["method"], alph, nstates, i, None, None, None, status="error",
+			error="{0}: {1}".format(type(error).__name__, error), **settings)
+	finally:
+		signal.alarm(0)
+	status = "done" if result[0] is not None else "invalid"
+	if options.get("profile"):
+		settings.update({"phase_times": dict(instrument.times), "phase_calls": dict(instrument.calls)})
+	if cache is not None:
+		settings.update({"cache_hits": cache.hits - hits, "cache_misses": cache.misses - misses})
+	return job, make_record(options["method"], alph, nstates, i, result, stop_perf - start_perf, stop_time - start_time, status=status, **settings)
+
+def run_benchmark(options, jobs=None, processes=None, verbose=True):
+	"""Run all jobs that are not in the store yet, spread over processes worker processes"""
+	done = read_done(options["method"], options["store"])
+	todo = [job for job in (all_jobs() if jobs is None else jobs) if job_name(*job) not in done]
+	if verbose:
+		print(len(done), "jobs done,", len(todo), "to do")
+	with Pool(processes=processes, initializer=start_worker) as pool:
+		for job, record in pool.imap_unordered(run_job, ((job, options) for job in todo)):
+			append_result(record, options["store"]) #Only the main process writes to the store
+			if verbose:
+				print(job_name(*job), record["status"], record["total_perf"])
+		pool.close() #Let the workers stop by themselves, so they close their caches (leaving the with block terminates them)
+		pool.join()
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Run the benchmark in parallel")
+	parser.add_argument("--method", default="GapHKC", help="Name under which the results are stored")
+	parser.add_argument("--store", default=RESULTS_FILE, help="File the results are appended to")
+	parser.add_argument("--learner", default="weighted_Lstar", choices=LEARNER_KWARGS)
+	parser.add_argument("--teacher", default="HKC", choices=backends.EQUIVALENCE)
+	parser.add_argument("--closed", default="gap", choices=[name for name in backends.CLOSEDNESS if name != "by_hand"])
+	parser.add_argument("--suffixes", default="all_suffixes", choices=SUFFIXES)
+	parser.add_argument("--corpus", default=None, help="Load the automata from this corpus file (see corpus.py) instead of one text file each")
+	parser.add_argument("--generate", type=int, default=None, metavar="SEED",
+		help="Generate the automata from this seed instead of loading them (use a new method name for every seed)")
+	parser.add_argument("--letters", type=int, default=4, help="Run the alphabets with 1 up to this number of letters")
+	parser.add_argument("--states", type=int, default=10, help="Run the automata with 1 up to this number of states")
+	parser.add_argument("--runs", type=int, default=100, help="Number of automata per alphabet and number of states")
+	parser.add_argument("--cache", default=None, help="SQLite file of membership queries shared between runs (see query_cache.py)")
+	parser.add_argument("--timeout", type=int, default=0, help="Maximum number of seconds per automaton (0 for no limit)")
+	parser.add_argument("--processes", type=int, default=cpu_count())
+	parser.add_argument("--batch", action="store_true", help="Check all rows of SA with one call to the closedness backend")
+	parser.add_argument("--prefilter", action="store_true", help="Reject rows that are independent modulo a prime before calling the backend (implies --batch)")
+	parser.add_argument("--profile", action="store_true", help="Store the time spent in each phase of the learner in the records")
+	args = parser.parse_args()
+	options = {"learner": args.learner, "teacher": args.teacher, "closed": args.closed, "suffixes": args.suffixes,
+		"timeout": args.timeout, "method": args.method, "store": args.store, "corpus": args.corpus, "generate": args.generate, "cache": args.cache, "batch": args.batch, "prefilter": args.prefilter, "profile": args.profile}
+	jobs = all_jobs(alphabets(args.letters), range(1, args.states + 1), range(1, args.runs + 1))
+	run_benchmark(options, jobs=jobs, processes=args.processes)
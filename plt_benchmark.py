@@ -1,26 +1,23 @@
 import matplotlib.pyplot as plt
 
+from results_store import load_results, aggregate
+
 if __name__ == "__main__":
 	methods = ["GapHKCBasis", "GapHKCMinimal", "GapHKC"] #["GapRandom", "GapHKC"] #, "GapRandomMinimal"] 
+	field = "closed_after_counterexample" #Any numerical field of the records, for example "states" or "process_time"
 	alph_todo = (['a'], ['a', 'b'], ['a', 'b', 'c'], ['a', 'b', 'c', 'd'])
+	records = load_results()
+	done = [r for r in records if r["status"] == "done"] # Timeouts and errors have no results to average
+	print("Averaging", len(done), "finished runs, leaving out", len(records) - len(done), "timed out or failed runs")
+	averages = aggregate(done, field)
+	runs = aggregate(done, field, function=len)
 	data = [[], [], []]
 	for mi, method in enumerate(methods):
 		for alph in alph_todo:
 			for nstates in range(1, 11):
-				#runtimes = []
-				states = 0
-				for i in range(1, 101):
-					filename = "Examples/benchmark/Results" + method + "/" + "".join(alph) + str(nstates) + "_" + str(i) + ".txt"
-					with open(filename, "r") as file:
-						lines = file.read().split("\n")
-						states += int(lines[6])
-						#states = max(states, float(lines[1]) - float(lines[7]))
-						#runtimes.append(float(lines[1]))
-						
-				#data[mi].append(states)
-				#data[mi].append(states)
-				print("Method:", method, ", alph:", alph, ", nstates:", nstates, ",average:", states/100)
-				data[mi].append(states/100)
+				average = averages[(method, "".join(alph), nstates)]
+				print("Method:", method, ", alph:", alph, ", nstates:", nstates, ",average:", average, ",runs:", runs[(method, "".join(alph), nstates)])
+				data[mi].append(average)
 
 	x_lab = ["".join(alph) + " & " + str(n) for alph in alph_todo for n in range(1, 11)]
 	#x_lab = [len(alph) + " & " + str(n) for alph in alph_todo for n in range(1, 11)]
@@ -44,4 +41,4 @@ if __name__ == "__main__":
 	
 	plt.setp(ax.get_xticklabels(), rotation=45, horizontalalignment='right')
 	plt.legend()
-	plt.show()
\ No newline at end of file
+	plt.show()
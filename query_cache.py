@@ -0,0 +1,159 @@
+"""
+Membership queries kept on disk between learning runs, in an SQLite database
+Every entry is keyed by the fingerprint of the target and the word, so runs of different learners and teachers on
+the same target share their queries. CachedTarget puts the cache in front of a target: give it to a learner instead of
+the target itself, all queries asked through member and member_batch are read from the cache and written into it
+The cache holds at most max_entries entries, the least recently used entries are evicted first (approximately, see QueryCache)
+Example: with QueryCache("queries.sqlite") as cache: weighted_Lstar(CachedTarget(aut, cache), ...); print(cache.stats())
+"""
+import hashlib
+import json
+import sqlite3
+
+from results_store import automaton_to_dict, weight_to_json, weight_from_json
+from words import letters
+
+CACHE_FILE = "Examples/benchmark/queries.sqlite"
+
+def fingerprint(aut):
+	"""Hash of the automaton aut, equal automata (with the transitions in the same order) have the same fingerprint"""
+	return hashlib.sha256(json.dumps(automaton_to_dict(aut), sort_keys=True).encode("utf-8")).hexdigest()
+
+def word_key(w):
+	"""The word as a string for the database, as a JSON list of its letters (letters can have more than one character)"""
+	return json.dumps(letters(w))
+
+class QueryCache:
+	"""
+	SQLite database of (target, word, weight) with the time of the last use of every entry, for the eviction
+	Several processes can use the same file, the writes of a batch are a single transaction
+	Lookups only read: the times of the entries that were found are written with the next store (or on close)
+	The eviction is approximate LRU: every process counts time on its own (starting from the latest time in the file
+	when it is opened), and the times of recent hits may not be written yet
+	hits and misses count the lookups of this instance, see stats
+	"""
+	def __init__(self, filename=CACHE_FILE, max_entries=10**7, evict_fraction=0.1):
+		self.filename = filename
+		self.max_entries = max_entries
+		self.evict_fraction = evict_fraction
+		self.db = sqlite3.connect(filename, timeout=60)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("""CREATE TABLE IF NOT EXISTS queries (id INTEGER PRIMARY KEY, target TEXT NOT NULL, word TEXT NOT NULL,
+			weight TEXT NOT NULL, used INTEGER NOT NULL, UNIQUE (target, word))""")
+		self.db.execute("CREATE INDEX IF NOT EXISTS queries_used ON queries (used)")
+		self.db.commit()
+		self.clock = self.db.execute("SELECT COALESCE(MAX(used), 0) FROM queries").fetchone()[0]
+		self.size = self.db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+		self.touched = {} # (target, word) to the time it was last found, not written yet
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def tick(self):
+		self.clock += 1
+		return self.clock
+
+	def lookup(self, target, words):
+		"""The cached weights of words for target, as a dictionary from the (found) words to their weights"""
+		keys = {word_key(w): w for w in words}
+		found = {}
+		key_list = list(keys)
+		for i in range(0, len(key_list), 500): # SQLite limits the number of parameters of a statement
+			chunk = key_list[i:i+500]
+			rows = self.db.execute("SELECT word, weight FROM queries WHERE target = ? AND word IN ({0})".format(", ".join("?" * len(chunk))),
+				[target] + chunk).fetchall()
+			for key, weight in rows:
+				found[keys[key]] = weight_from_json(json.loads(weight))
+		if found:
+			now = self.tick()
+			self.touched.update(((target, word_key(w)), now) for w in found)
+		self.hits += len(found)
+		self.misses += len(keys) - len(found)
+		return found
+
+	def store(self, target, weights):
+		"""Add the weights, a dictionary from words to weights, for target"""
+		now = self.tick()
+		cursor = self.db.executemany("INSERT OR IGNORE INTO queries (target, word, weight, used) VALUES (?, ?, ?, ?)",
+			((target, word_key(w), json.dumps(weight_to_json(x)), now) for w, x in weights.items()))
+		self.size += cursor.rowcount # Words another process stored first are ignored, and not counted
+		self.write_touched()
+		self.db.commit()
+		if self.size > self.max_entries:
+			self.evict()
+
+	def write_touched(self):
+		"""Write the times of the entries found since the last write (the caller commits)"""
+		if self.touched:
+			self.db.executemany("UPDATE queries SET used = ? WHERE target = ? AND word = ?",
+				((now, target, key) for (target, key), now in self.touched.items()))
+			self.touched.clear()
+
+	def evict(self):
+		"""Delete the least recently used entries, until the cache is evict_fraction below max_entries"""
+		self.size = self.db.execute("SELECT COUNT(*) FROM queries").fetchone()[0] # Other processes may have added entries
+		excess = self.size - int(self.max_entries * (1 - self.evict_fraction))
+		if excess > 0:
+			self.db.execute("DELETE FROM queries WHERE id IN (SELECT id FROM queries ORDER BY used LIMIT ?)", (excess, ))
+			self.db.commit()
+			self.size -= excess
+			self.evictions += excess
+
+	def clear(self, target=None):
+		"""Delete all entries, or only those of target"""
+		if target is None:
+			self.db.execute("DELETE FROM queries")
+		else:
+			self.db.execute("DELETE FROM queries WHERE target = ?", (target, ))
+		self.db.commit()
+		self.size = self.db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0,
+			"size": self.size, "max_entries": self.max_entries, "evictions": self.evictions}
+
+	def close(self):
+		self.write_touched()
+		self.db.commit()
+		self.db.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class CachedTarget:
+	"""
+	The target wfa with its membership queries read through cache: member and member_batch only ask wfa the words
+	that are not in the cache, and store the answers
+	target is the fingerprint of wfa, computed by fingerprint(wfa) if it is not given (give it for black-box targets)
+	Everything else (alphabet, weights, ... used by the teachers) is the attribute of wfa,
+	except member_table, so the observation table asks the words through member_batch
+	"""
+	def __init__(self, wfa, cache, target=None):
+		self.wfa = wfa
+		self.cache = cache
+		self.target = fingerprint(wfa) if target is None else target
+
+	def member_batch(self, words):
+		words = list(words)
+		weights = self.cache.lookup(self.target, words)
+		missing = list(dict.fromkeys(w for w in words if w not in weights))
+		if missing:
+			new = dict(zip(missing, self.wfa.member_batch(missing)))
+			self.cache.store(self.target, new)
+			weights.update(new)
+		return [weights[w] for w in words]
+
+	def member(self, word, verbose=False):
+		weight = self.member_batch([word])[0]
+		if verbose:
+			print(word, weight)
+		return weight
+
+	def __getattr__(self, name):
+		if name == "member_table" or name == "wfa" or name.startswith("__"):
+			raise AttributeError(name)
+		return getattr(self.wfa, name)
@@ -0,0 +1,116 @@
+"""
+Exact linear algebra over the rationals in pure Python
+Uses fraction-free (Bareiss) elimination: all intermediate entries are integers (minors of the input),
+so no fractions are built until a solution is returned and the entries stay polynomial in size
+"""
+from fractions import Fraction
+from math import gcd
+
+def _eliminate(pivot, u, c, v, divisor):
+	"""(pivot*u - c*v) / divisor for integer vectors u and v, where the shorter vector is padded with zeros (the division is exact)"""
+	if len(u) < len(v):
+		u = u + [0] * (len(v) - len(u))
+	elif len(v) < len(u):
+		v = v + [0] * (len(u) - len(v))
+	return [(pivot*a - c*b) // divisor for a, b in zip(u, v)]
+
+def _pivot(v):
+	"""Index of the first nonzero entry of v, or None if v is zero"""
+	for i, a in enumerate(v):
+		if a != 0:
+			return i
+	return None
+
+def _reduce(basis, row, trans, d):
+	"""
+	Bareiss step of row against every row of basis, a list of [pivot, row, trans] in the order they were added
+	trans and d keep track of the combination: the reduced row is d * row + trans * generators
+	"""
+	divisor = 1
+	for p, b, bt in basis:
+		c = row[p]
+		row = _eliminate(b[p], row, c, b, divisor)
+		trans = _eliminate(b[p], trans, c, bt, divisor)
+		d = b[p] * d // divisor
+		divisor = b[p]
+	return row, trans, d
+
+def _number(x):
+	"""x as an int if it is integral, otherwise as a Fraction"""
+	return x.numerator if x.denominator == 1 else x
+
+def _denominator(v):
+	"""The least common multiple of the denominators of the entries of v"""
+	denominator = 1
+	for x in v:
+		if isinstance(x, Fraction) and x.denominator != 1:
+			denominator = denominator * x.denominator // gcd(denominator, x.denominator)
+	return denominator
+
+def _solve(basis, v, scales):
+	"""
+	Solve x*M = v using the echelon basis of M, returns None if v is not in the span
+	Row i of M was multiplied by scales[i] to make it integral, v may have rational entries
+	"""
+	scale = _denominator(v)
+	row, trans, d = _reduce(basis, [int(x * scale) for x in v], [0] * len(scales), 1)
+	if any(row):
+		return None
+	trans = trans + [0] * (len(scales) - len(trans))
+	return [_number(Fraction(-t * s, d * scale)) for t, s in zip(trans, scales)]
+
+def integer_vector(v):
+	"""v multiplied by the least common multiple of the denominators of its entries, so it has the same span"""
+	denominator = _denominator(v)
+	return [int(x * denominator) for x in v]
+
+def rank(M):
+	"""The rank of the rational matrix M (a list of rows)"""
+	return len(RationalSpan(M))
+
+def solution_mat(M, v):
+	"""
+	Pure Python version of GAP's SolutionMat for rational matrices
+	Return a rational vector x such that x*M = v, or None if no such vector exists
+	For example: solution_mat([[2, 0], [0, 4]], [1, 1]) = [Fraction(1, 2), Fraction(1, 4)]
+	"""
+	return RationalSpan(M).solve(v)
+
+class RationalSpan:
+	"""
+	Vector space over the rationals spanned by a growing list of integer generators, kept in fraction-free echelon form
+	Generators can be appended with add_row, checking if v is in the span is a single fraction-free reduction
+	Rational generators and vectors are multiplied by the denominators of their entries first
+	"""
+	def __init__(self, rows=None, width=0):
+		self.basis = [] # List of [pivot, row, trans], where row is d times the added generator plus trans times the earlier ones
+		self.ngens = 0
+		self.scales = [] # Generator i is stored multiplied by scales[i]
+		self.width = width
+		if rows is not None:
+			for row in rows:
+				self.add_row(row)
+
+	def add_row(self, row):
+		"""Add a generator, row must have one entry per column"""
+		row = list(row)
+		if self.ngens == 0 and self.width == 0:
+			self.width = len(row)
+		scale = _denominator(row)
+		row, trans, d = _reduce(self.basis, [int(x * scale) for x in row], [0] * self.ngens, 1)
+		self.scales.append(scale)
+		self.ngens += 1
+		p = _pivot(row)
+		if p is not None:
+			self.basis.append([p, row, trans + [d]])
+
+	def solve(self, v):
+		"""Return a rational x such that x times the generators is v, or None if v is not in the span"""
+		return _solve(self.basis, v, self.scales)
+
+	def __contains__(self, v):
+		return self.solve(v) is not None
+
+	def __len__(self):
+		"""The dimension of the span"""
+		return len(self.basis)
@@ -0,0 +1,45 @@
+from weighted_automaton import *
+from WLstar import *
+from rational import solution_mat, RationalSpan
+from native_main import tzeng
+
+def closed_by_bareiss(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=False):
+	"""
+	Closedness over the rationals instead of the integers, using fraction-free (Bareiss) elimination
+	Return the rational linear combination of the rows of S x E giving t x E, or False if it does not exist
+	"""
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	if txE is None:
+		txE = [membership_queries[t+e] for e in E]
+	result = solution_mat(SxE, txE)
+	if result is None:
+		if verbose:
+			print("Bareiss: Fail, len S/len E:", len(S), len(E), "t:", t)
+		return False
+	return result
+
+def closed_by_bareiss_batch(wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+	"""Batch version of closed_by_bareiss (see closed_by_rows): S x E is brought into echelon form once for all rows of T"""
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	span = RationalSpan(SxE, width=len(E))
+	return solve_rows(span.solve, "Bareiss", S, E, T, membership_queries, TxE, first, verbose)
+
+def rational_weighted_Lstar(wfa, check_counterexample=tzeng, counterexample_suffixes=all_suffixes, instrument=NO_INSTRUMENTATION, verbose=False, count=False):
+	"""
+	Learns wfa as a weighted automaton over the rationals, which needs neither GAP nor GCD bookkeeping
+	The result has rational weights and is minimal over the rationals, so it can have fewer states than the results of the integer learners
+	Returns the same as weighted_Lstar
+	The teacher has to accept rational models, like tzeng (HKC only works for integer weights)
+	"""
+	return weighted_Lstar(wfa, check_closed=closed_by_bareiss, check_counterexample=check_counterexample,
+		counterexample_suffixes=counterexample_suffixes, check_closed_batch=closed_by_bareiss_batch,
+		instrument=instrument, verbose=verbose, count=count)
+
+if __name__ == "__main__":
+	aut = load_automaton("Examples/38o.txt")
+	print(aut)
+	res = rational_weighted_Lstar(aut, check_counterexample=tzeng, verbose=False, count=True)
+	print(res[0])
+	compare_machines(aut, res[0], prover=random_counterexample)
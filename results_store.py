@@ -0,0 +1,116 @@
+"""
+Benchmark results, stored as one JSON record per run in a single append-only file
+A record has named fields (see make_record), so analysis scripts do not depend on line positions in result files
+"""
+from fractions import Fraction
+import ast
+import json
+import os
+
+from weighted_automaton import Weighted_Automaton
+
+RESULTS_FILE = "Examples/benchmark/results.jsonl"
+
+def weight_to_json(w):
+	"""Rational weights (of the rational learner) are stored as strings like "3/4", integers as numbers"""
+	return str(w) if isinstance(w, Fraction) else w
+
+def weight_from_json(w):
+	return Fraction(w) if isinstance(w, str) else w
+
+def automaton_to_dict(aut):
+	return {"alphabet": aut.alphabet, "weights": [weight_to_json(w) for w in aut.weights],
+		"initial": [weight_to_json(w) for w in aut.initial],
+		"transitions": [[k[0], k[1], r[0], weight_to_json(r[1])] for k, v in aut.transitions.items() for r in v]}
+
+def automaton_from_dict(d):
+	aut = Weighted_Automaton(alphabet=d["alphabet"], weights=[weight_from_json(w) for w in d["weights"]],
+		initial=[weight_from_json(w) for w in d["initial"]])
+	for q0, a, q1, w in d["transitions"]:
+		aut.add_transition(q0, a, q1, weight_from_json(w))
+	return aut
+
+def automaton_from_str(text):
+	"""The automaton written as str(aut) (see Weighted_Automaton.__str__), as in the ...A.txt files of older benchmark runs"""
+	fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+	aut = Weighted_Automaton(alphabet=ast.literal_eval(fields["Alphabet"]), weights=ast.literal_eval(fields["Weights"]),
+		initial=ast.literal_eval(fields["Initial"]))
+	for q0, a, q1, w in ast.literal_eval(fields["Transitions"]):
+		aut.add_transition(q0, a, q1, w)
+	return aut
+
+def make_record(method, alph, nstates, i, result, total_perf, total_time, status="done", **fields):
+	"""
+	The record of a single run, where result is the tuple returned by one of the learners
+	Extra fields (for example the learner and teacher used) can be given as keyword arguments
+	"""
+	record = {"method": method, "alphabet": "".join(alph), "nstates": nstates, "index": i, "status": status,
+		"total_perf": total_perf, "process_time": total_time}
+	if result is not None:
+		record.update({"states": len(result[0].weights) if result[0] is not None else None, "membership_queries": result[1],
+			"closed_count": result[2], "equivalence_queries": result[3], "closed_after_counterexample": result[4],
+			"teacher_time": float(result[5]), "columns": result[6] if len(result) > 6 else None,
+			"automaton": automaton_to_dict(result[0]) if result[0] is not None else None})
+	record.update(fields)
+	return record
+
+def append_result(record, filename=RESULTS_FILE):
+	"""Append a record to the store, the line is flushed to disk so it survives a crash of the benchmark"""
+	with open(filename, "a") as file:
+		file.write(json.dumps(record) + "\n")
+		file.flush()
+		os.fsync(file.fileno())
+
+def load_results(filename=RESULTS_FILE, **filters):
+	"""
+	All records in the store for which the given fields have the given values
+	Example: load_results(method="GapHKC", alphabet="ab") gives all runs of GapHKC on the alphabet ['a', 'b']
+	A line that was only partially written (by a crash) is ignored
+	"""
+	records = []
+	if not os.path.exists(filename):
+		return records
+	with open(filename, "r") as file:
+		for line in file:
+			try:
+				record = json.loads(line)
+			except json.JSONDecodeError:
+				continue
+			if all(record.get(k) == v for k, v in filters.items()):
+				records.append(record)
+	return records
+
+def aggregate(records, field, key=("method", "alphabet", "nstates"), function=None):
+	"""
+	Group records by the fields in key and apply function (default: the average) to the values of field in each group
+	Returns a dictionary mapping the tuple of key values to the result
+	Example: aggregate(load_results(), "states") gives the average number of states for each method, alphabet and size
+	"""
+	if function is None:
+		function = lambda values: sum(values) / len(values)
+	groups = {}
+	for record in records:
+		if record.get(field) is not None:
+			groups.setdefault(tuple(record[k] for k in key), []).append(record[field])
+	return {k: function(values) for k, values in groups.items()}
+
+def import_text_results(method, alphabets, sizes=range(1, 11), runs=range(1, 101), filename=RESULTS_FILE):
+	"""
+	Convert the result files of an older benchmark run (Examples/benchmark/Results<method>/) into records of the store
+	The learned automaton is read from the ...A.txt file of the run, a run without one gets a record without automaton
+	"""
+	fields = ["total_perf", "process_time", "states", "membership_queries", "closed_count", "equivalence_queries",
+		"closed_after_counterexample", "teacher_time", "columns"]
+	for alph in alphabets:
+		for nstates in sizes:
+			for i in runs:
+				name = "Examples/benchmark/Results" + method + "/" + "".join(alph) + str(nstates) + "_" + str(i)
+				with open(name + ".txt", "r") as file:
+					lines = file.read().split("\n")
+				record = {"method": method, "alphabet": "".join(alph), "nstates": nstates, "index": i, "status": "done"}
+				for field, line in zip(fields, lines):
+					record[field] = float(line) if field in ("total_perf", "process_time", "teacher_time") else int(line)
+				if os.path.exists(name + "A.txt"):
+					with open(name + "A.txt", "r") as file:
+						record["automaton"] = automaton_to_dict(automaton_from_str(file.read()))
+				append_result(record, filename)
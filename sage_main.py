@@ -1,11 +1,26 @@
 from collections import defaultdict, deque
-from sage.interfaces.gap import *
 from math import gcd
 from functools import reduce
 from time import process_time
 
 from weighted_automaton import *
 from WLstar import *
+from lattice import IntegerLattice
+from observation_table import ObservationTable
+from words import EPSILON, codes, word
+from instrumentation import NO_INSTRUMENTATION
+
+gap_interface = None # Sage's GAP interface, imported on the first call to gap
+
+def gap(command):
+	"""
+	Evaluate command in GAP and return the result
+	Sage and GAP are only loaded on the first call, so importing this module (for HKC or the learners) stays cheap
+	"""
+	global gap_interface
+	if gap_interface is None:
+		from sage.interfaces.gap import gap as gap_interface
+	return gap_interface(command)
 
 # Calls to gap look like: result = gap("SolutionIntMat([[3,1], [2,4]], [5,5])")
 def closed_by_gap(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=False):
@@ -21,23 +36,60 @@ def closed_by_gap(wfa, S, E, t, membership_queries, SxE=None, txE=None, verbose=
 		return False
 	return map(int, list(result))
 
+# Solves the rows in vs one by one inside GAP, stopping at the first fail if first is true
+GAP_SOLUTIONS = """function(M, vs, first)
+	local result, v, c;
+	result := [];
+	for v in vs do
+		c := SolutionIntMat(M, v);
+		Add(result, c);
+		if c = fail and first then
+			break;
+		fi;
+	od;
+	return result;
+end"""
+
+def closed_by_gap_batch(wfa, S, E, T, membership_queries, SxE=None, TxE=None, first=True, verbose=False):
+	"""
+	Batch version of closed_by_gap (see closed_by_rows): all rows of T are checked with a single GAP command,
+	so S x E is sent to GAP once instead of once for every row
+	GAP still solves every row with its own SolutionIntMat, so this only saves the round-trips: unlike closed_by_hnf_batch,
+	the factorization of S x E is not shared between the rows
+	"""
+	if SxE is None:
+		SxE = [[membership_queries[s+e] for e in E] for s in S]
+	if TxE is None:
+		TxE = [[membership_queries[t+e] for e in E] for t in T]
+	if not T:
+		return {}
+	input = "CallFuncList(" + GAP_SOLUTIONS + ", [" + str(SxE) + ", " + str(TxE) + ", " + str(first).lower() + "])"
+	result = {}
+	for t, c in zip(T, gap(input)):
+		if str(c) == "fail":
+			if verbose:
+				print("GAP: Fail, len S/len E:", len(S), len(E), "t:", t)
+			result[t] = False
+		else:
+			result[t] = [int(x) for x in c]
+	return result
+
 def HKC(wfa, model, membership_queries, verbose=False):
 	if verbose:
 		print("Running HKC to find a counterexample.")
-	R = []
+	R = IntegerLattice(width=len(wfa.weights) + len(model.weights)) #Kept in Hermite normal form, so checking v is a single reduction
 	todo = deque()
-	m1 = wfa.member_distribution("")
-	m2 = model.member_distribution("")
+	m1 = wfa.member_distribution(EPSILON)
+	m2 = model.member_distribution(EPSILON)
 	if m1[0] != m2[0]:
-		return ""
-	todo.append(("", wfa.initial, model.initial))
+		return EPSILON
+	todo.append((EPSILON, wfa.initial, model.initial))
+	alphabet = codes(wfa.alphabet)
 	while todo:
 		w, v1, v2 = todo.popleft()
 		v = v1+v2
-		input = "SolutionIntMat(" + str(R) + ", " + str(v) + ")"
-		result = gap(input)
-		if str(result) == "fail":
-			for a in wfa.alphabet:
+		if v not in R:
+			for a in alphabet:
 				m1 = wfa.member_distribution(a, distribution=v1)
 				m2 = model.member_distribution(a, distribution=v2)
 				if m1[0] != m2[0]:
@@ -45,180 +97,138 @@ def HKC(wfa, model, membership_queries, verbose=False):
 						print("Found counterexample:", w+a)
 					return w+a
 				todo.append((w+a, m1[1], m2[1]))
-			R.append(v)
+			R.add_row(v)
 	if verbose:
 		print("No counterxample found")
 	return None
 
-def handle_counterexample(wfa, cex, S, E, transitions, membership_table, membership_queries, GCDs, verbose=False):
-	suff = [e for e in suffixes(cex) if e not in E]
+def scaled_row(table, s, GCDs):
+	"""Row s of the observation table divided by the GCD of the row (the GCD is part of the transition weights)"""
+	g = GCDs[s] if GCDs[s] else 1 #Default to 1 if GCD is 0
+	return [w // g for w in table.row(s)]
+
+def handle_counterexample(wfa, cex, S, E, transitions, table, GCDs, columns=None, instrument=NO_INSTRUMENTATION, verbose=False):
+	"""Add the columns for the counterexample cex to E (all suffixes of cex, unless columns is given) and update the GCDs"""
+	if columns is None or all(e in E for e in columns):
+		columns = suffixes(cex) #Also used when the model was wrong because of a wrong assumption on the GCDs
+	k = len(E)
+	E.extend(e for e in columns if e not in E)
+	with instrument.phase("fill table"):
+		table.fill(S)
+	alphabet = codes(wfa.alphabet)
 	for s in reversed(S):
 		gcdo = GCDs[s]
-		GCDs[s] = reduce(gcd, (GCDs[s+a] for a in wfa.alphabet if s+a in GCDs), GCDs[s])
+		GCDs[s] = reduce(gcd, (GCDs[s+a] for a in alphabet if s+a in GCDs), GCDs[s])
 		if verbose and gcdo != GCDs[s]:
 			print("Changed GCD for", s, "from", gcdo, "to", GCDs[s])
-		for e in suff:
-			if s+e not in membership_queries:
-				membership_queries[s+e] = wfa.member(s+e)
-		gcds = reduce(gcd, (membership_queries[s+e] for e in suff), GCDs[s])
+		gcds = reduce(gcd, table.row(s)[k:], GCDs[s])
 		if gcds != gcdo:
-			gcdo = gcds
 			if verbose:
 				print("New gcd for '", s, "'", GCDs[s], gcds)
 			GCDs[s] = gcds
-			for e in E:
-				membership_table[s][e] = membership_queries[s+e] // GCDs[s]
-		for e in suff:
-			membership_table[s][e] = membership_queries[s+e] // GCDs[s]
-		#Below: Special case for if suff is empty (which happens when we made a bad assumption about the GCDS)
-		if gcdo != GCDs[s]:
-			for e in E:
-				se = s+e
-				membership_table[s][e] = membership_queries[se] // GCDs[s]
 	for s in S:
 		gcds = GCDs[s[:-1]] if s[:-1] in GCDs and s[:-1] != s else 1 #Need check s[:-1] != s because ""[:-1] == ""
 		transitions[s] = GCDs[s] // gcds
-	E.extend(suff)
-	return E, transitions, membership_table, membership_queries, GCDs
+	return E, transitions, table, GCDs
 	
-def check_table_closed_count(wfa, S, E, transitions, membership_queries, membership_table, GCDs, closed_count=0, cex_found=False, check_closed=closed_by_gap, verbose=False):
+def check_table_closed_count(wfa, S, E, transitions, table, GCDs, closed_count=0, cex_found=False, check_closed=closed_by_gap, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False):
+	if check_closed_batch is None:
+		check_closed_batch = closed_by_rows(instrument.wrap("backend call", check_closed))
 	closed = False
+	alphabet = codes(wfa.alphabet)
 	while not closed:
 		closed = True
-		SA = list(s + a for s in S for a in wfa.alphabet)
+		SA = list(s + a for s in S for a in alphabet)
 		lin_com = defaultdict(list)
-		lin_com[""] = [0]*len(S)
-		lin_com[""][0] = transitions[""]
+		lin_com[EPSILON] = [0]*len(S)
+		lin_com[EPSILON][0] = transitions[EPSILON]
+		with instrument.phase("fill table"):
+			table.fill(S + SA)
+		SxE = [scaled_row(table, s, GCDs) for s in S] #S and E do not change during one pass over SA
 		closed_count += 1
+		T = [t for t in SA if t not in S]
+		TxE = [[w // (GCDs[t[:-1]] if GCDs[t[:-1]] else 1) for w in table.row(t)] for t in T] #Default to 1 if GCD is 0
+		instrument.record("closedness size", (len(S), len(E)))
+		with instrument.phase("check_closed"):
+			results = check_closed_batch(wfa, S, E, T, table.queries, SxE=SxE, TxE=TxE, verbose=verbose)
 		for t in SA:
 			if t in S:
 				lin_com[t] = [0]*len(S)
 				lin_com[t][S.index(t)] = transitions[t]
 			else:
-				#print("Finding linear combination for", t)
-				for e in E:
-					if t+e not in membership_queries:
-						membership_queries[t+e] = wfa.member(t+e)
-				gcdt = GCDs[t[:-1]] if GCDs[t[:-1]] else 1 #Default to 1 if GCD is 0
-				txE = [membership_queries[t+e] // gcdt for e in E]
-				SxE = [[membership_table[s][e] for e in E] for s in S]
-				c = check_closed(wfa, S, E, t, membership_queries, SxE=SxE, txE=txE, verbose=verbose)
+				c = results[t]
 				if c is False:
 					closed = False
 					cex_found = False
-					GCDt = reduce(gcd, (membership_queries[t+e] for e in E))
+					GCDt = reduce(gcd, table.row(t))
 					if GCDt % GCDs[t[:-1]] != 0:
 						# Our assumption for the GCD of t[:-1] was wrong. This yields a counterexample, which we handle (which updates the GCD) 
 						for e in E:
-							if t+e not in membership_queries:
-								membership_queries[t+e] = wfa.member(t+e)
-							if membership_queries[t+e] % GCDs[t[:-1]] != 0:
-								E, transitions, membership_table, membership_queries, GCDs = handle_counterexample(wfa, t+e, S, E, transitions, membership_table, membership_queries, GCDs, verbose=verbose)
+							if table.query(t+e) % GCDs[t[:-1]] != 0:
+								E, transitions, table, GCDs = handle_counterexample(wfa, t+e, S, E, transitions, table, GCDs, instrument=instrument, verbose=verbose)
 					else:
 						S.append(t)
 						GCDs[t] = GCDt
 						transitions[t] = GCDs[t] // GCDs[t[:-1]]
-						membership_table[t] = {}
-						for e in E:
-							membership_table[t][e] = membership_queries[t+e] // GCDs[t]
 					break
 				else:
 					lin_com[t] = list(c)
-	return lin_com, S, transitions, membership_queries, membership_table, GCDs, closed_count, cex_found
+	return lin_com, S, transitions, table, GCDs, closed_count, cex_found
 	
-def check_table_closed(wfa, S, E, transitions, membership_queries, membership_table, GCDs, check_closed=closed_by_gap, verbose=False):
-	closed = False
-	while not closed:
-		closed = True
-		SA = list(s + a for s in S for a in wfa.alphabet)
-		lin_com = defaultdict(list)
-		lin_com[""] = [0]*len(S)
-		lin_com[""][0] = transitions[""]
-		for t in SA:
-			if t in S:
-				lin_com[t] = [0]*len(S)
-				lin_com[t][S.index(t)] = transitions[t]
-			else:
-				#print("Finding linear combination for", t)
-				for e in E:
-					if t+e not in membership_queries:
-						membership_queries[t+e] = wfa.member(t+e)
-				gcdt = GCDs[t[:-1]] if GCDs[t[:-1]] else 1 #Default to 1 if GCD is 0
-				txE = [membership_queries[t+e] // gcdt for e in E]
-				SxE = [[membership_table[s][e] for e in E] for s in S]
-				c = check_closed(wfa, S, E, t, membership_queries, SxE=SxE, txE=txE, verbose=verbose)
-				if c is False:
-					closed = False
-					GCDt = reduce(gcd, (membership_queries[t+e] for e in E))
-					if GCDt % GCDs[t[:-1]] != 0:
-						# Our assumption for the GCD of t[:-1] was wrong. This yields a counterexample, which we handle (which updates the GCD) 
-						for e in E:
-							if t+e not in membership_queries:
-								membership_queries[t+e] = wfa.member(t+e)
-							if membership_queries[t+e] % GCDs[t[:-1]] != 0:
-								E, transitions, membership_table, membership_queries, GCDs = handle_counterexample(wfa, t+e, S, E, transitions, membership_table, membership_queries, GCDs, verbose=verbose)
-					else:
-						S.append(t)
-						GCDs[t] = GCDt
-						transitions[t] = GCDs[t] // GCDs[t[:-1]]
-						membership_table[t] = {}
-						for e in E:
-							membership_table[t][e] = membership_queries[t+e] // GCDs[t]
-					break
-				else:
-					lin_com[t] = list(c)
-	return lin_com, S, transitions, membership_queries, membership_table, GCDs
+def check_table_closed(wfa, S, E, transitions, table, GCDs, check_closed=closed_by_gap, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False):
+	lin_com, S, transitions, table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, table, GCDs, check_closed=check_closed, check_closed_batch=check_closed_batch, instrument=instrument, verbose=verbose)
+	return lin_com, S, transitions, table, GCDs
 
-def remove_redundant(wfa, S, E, membership_queries, membership_table, GCDs, transitions, closed_count, cex_found, total_teacher_time, check_closed=closed_by_gap, check_counterexample=HKC, verbose=False):
-	for i in range(len(S)-1, 0, -1): #Note: Stop at 1 so "" doesn't get removed from S
-		SxE = [[membership_table[s][e] for e in E] for j, s in enumerate(S) if j != i]
+def remove_redundant(wfa, S, E, table, GCDs, transitions, closed_count, cex_found, total_teacher_time, check_closed=closed_by_gap, check_counterexample=HKC, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False):
+	for i in range(len(S)-1, 0, -1): #Note: Stop at 1 so EPSILON doesn't get removed from S
+		SxE = [scaled_row(table, s, GCDs) for j, s in enumerate(S) if j != i]
 		t = S[i]
 		gcdt = GCDs[t[:-1]] if t[:-1] in GCDs else 1
-		txE = [membership_queries[t+e] // gcdt for e in E]
-		ci = check_closed(wfa, S, E, t, membership_queries, SxE=SxE, txE=txE, verbose=False)
+		txE = [w // gcdt for w in table.row(t)]
+		with instrument.phase("check_closed"):
+			ci = instrument.wrap("backend call", check_closed)(wfa, S, E, t, table.queries, SxE=SxE, txE=txE, verbose=False)
 		if ci is not False:
 			if verbose:
 				print("Removing", t, "ci:", list(ci))
-			previously_removed.add(S[i])
 			del S[i]
-			del membership_table[t]
 			del GCDs[t]
 			del transitions[t]
-	lin_com, S, transitions, membership_queries, membership_table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, membership_queries, membership_table, GCDs, closed_count, cex_found, verbose=verbose)
-	model = create_machine(wfa.alphabet, S, (membership_table[s][""] for s in S), lin_com)
-	membership_count = len(membership_queries)
+	lin_com, S, transitions, table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, table, GCDs, closed_count, cex_found, check_closed=check_closed, check_closed_batch=check_closed_batch, instrument=instrument, verbose=verbose)
+	with instrument.phase("create_machine"):
+		model = create_machine(wfa.alphabet, S, (scaled_row(table, s, GCDs)[0] for s in S), lin_com) #E[0] is the empty word
+	membership_count = len(table.queries)
 	teacher_start = process_time()
-	cex = check_counterexample(wfa, model, membership_queries)
+	with instrument.phase("equivalence query"):
+		cex = word(check_counterexample(wfa, model, table.queries)) #Teachers may also return lists of letters
 	teacher_stop = process_time()
 	total_teacher_time += teacher_stop - teacher_start
 	if cex is None:
 		if verbose:
 			print("S:", S, "E:", E)
 			for s in S:
-				print(s, [membership_queries[s+e] for e in E], GCDs[s])
-			for t in (s + a for s in S for a in wfa.alphabet if s + a not in S):
-				print(t, [membership_queries[t+e] for e in E])
+				print(s, table.row(s), GCDs[s])
+			for t in (s + a for s in S for a in codes(wfa.alphabet) if s + a not in S):
+				print(t, table.row(t))
 		return model, membership_count, total_teacher_time
 	elif verbose:
 		print("Found counterexample after removing states:", cex)
 	return None, membership_count, total_teacher_time
 
-def modified_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexample=HKC, verbose=False, count=False):
+def modified_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexample=HKC, counterexample_suffixes=all_suffixes, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False, count=False):
 	"""
 	Learns wfa using Lstar for weighted automata
 	Makes two changes from the standard algorithm to get smaller results:
 	1) The GCD of rows of SxE is computed. The GCD becomes the transition weight, the other factors are state weights
 	2) At the end of the algorithm, check if any of the rows have become redundant by seeing if they are a linear combination of the other rows
-	Also keeps track of statistics to be used in analysis of the algorithm
+	Also keeps track of statistics to be used in analysis of the algorithm, the last of which is the number of columns of the final table
+	counterexample_suffixes, check_closed_batch and instrument are as in WLstar.weighted_Lstar
 	"""
-	S = [""]
-	E = [""]
-	membership_queries = {}
-	membership_queries[""] = wfa.member("")
-	membership_table = {"": {"": 1}}
-	GCDs = {"": membership_queries[""]}
-	transitions = {"": membership_queries[""]}
-	previously_removed = set()
+	table = ObservationTable(wfa)
+	S = table.S
+	E = table.E
+	table.fill(S)
+	GCDs = {EPSILON: table.value(EPSILON, EPSILON)}
+	transitions = {EPSILON: table.value(EPSILON, EPSILON)}
 	membership_count = 0
 	closed_count = 0
 	equivalence_count = 0
@@ -226,14 +236,16 @@ def modified_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexampl
 	closed_after_counterexample = 0
 	total_teacher_time = 0
 	while True:
-		lin_com, S, transitions, membership_queries, membership_table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, membership_queries, membership_table, GCDs, closed_count=closed_count, cex_found=cex_found, verbose=verbose)
+		lin_com, S, transitions, table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, table, GCDs, closed_count=closed_count, cex_found=cex_found, check_closed=check_closed, check_closed_batch=check_closed_batch, instrument=instrument, verbose=verbose)
 		if cex_found and count:
 			closed_after_counterexample += 1
-		model = create_machine(wfa.alphabet, S, (membership_table[s][""] for s in S), lin_com)
-		membership_count = len(membership_queries)
+		with instrument.phase("create_machine"):
+			model = create_machine(wfa.alphabet, S, (scaled_row(table, s, GCDs)[0] for s in S), lin_com) #E[0] is the empty word
+		membership_count = len(table.queries)
 		equivalence_count += 1
 		teacher_start = process_time()
-		cex = check_counterexample(wfa, model, membership_queries)
+		with instrument.phase("equivalence query"):
+			cex = word(check_counterexample(wfa, model, table.queries)) #Teachers may also return lists of letters
 		teacher_stop = process_time()
 		total_teacher_time += teacher_stop - teacher_start
 		if verbose:
@@ -241,70 +253,43 @@ def modified_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexampl
 			if cex is not None:
 				print("WFA:", wfa.member(cex), "Model:", model.member(cex))
 		if cex is None:
-			model, membership_count, total_teacher_time = remove_redundant(wfa, S, E, membership_queries, membership_table, GCDs, transitions, closed_count, cex_found, total_teacher_time, check_closed=check_closed, check_counterexample=check_counterexample, verbose=False)
-			return model, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time
+			model, membership_count, total_teacher_time = remove_redundant(wfa, S, E, table, GCDs, transitions, closed_count, cex_found, total_teacher_time, check_closed=check_closed, check_counterexample=check_counterexample, check_closed_batch=check_closed_batch, instrument=instrument, verbose=False)
+			instrument.count_run(membership_count, closed_count, equivalence_count)
+			return model, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time, len(E)
 		cex_found = True
-		E, transitions, membership_table, membership_queries, GCDs = handle_counterexample(wfa, cex, S, E, transitions, membership_table, membership_queries, GCDs, verbose=verbose)
+		with instrument.phase("counterexample processing"):
+			columns = counterexample_suffixes(wfa, model, cex, S, table.queries, scale=GCDs)
+		E, transitions, table, GCDs = handle_counterexample(wfa, cex, S, E, transitions, table, GCDs, columns=columns, instrument=instrument, verbose=verbose)
 
-def basis_by_gap(wfa, S, E, membership_queries, membership_table, GCDs, total_teacher_time, check_closed=closed_by_gap, check_counterexample=HKC, verbose=False):
-	E_ext = E + [a + e for a in wfa.alphabet for e in E]
-	for s in S:
-		for e in E_ext:
-			if e not in membership_table[s]:
-				membership_queries[s+e] = wfa.member(s+e)
-				membership_table[s][e] = membership_queries[s+e] // GCDs[s]
-	SxE = [[membership_table[s][e] for e in E_ext] for s in S]
-	input = "BaseIntMat(" + str(SxE) + ")"
-	gap_result = gap(input)
-	basis_ext = [[int(y) for y in x] for x in gap_result]
-	basis_map = {i: {e: basis_ext[i][j] for j, e in enumerate(E_ext)} for i in range(len(basis_ext))}
-	basis = [[basis_map[i][e] for e in E] for i in range(len(basis_ext))]
-	if verbose:
-		for b in basis:
-			print(b)
-	epsilonxE = [membership_queries[e] for e in E]
-	initial = closed_by_gap(wfa, S, E, "", membership_queries, SxE=basis, txE=epsilonxE, verbose=verbose)
-	model = Weighted_Automaton(alphabet=wfa.alphabet, weights=[basis_map[i][""] for i in range(len(basis_ext))], initial=initial)
-	for q0 in range(len(basis_ext)):
-		for a in wfa.alphabet:
-			txE = [basis_map[q0][a+e] for e in E]
-			transitions = closed_by_gap(wfa, S, E, a, membership_queries, SxE=basis, txE=txE, verbose=verbose)
-			for q1, w in enumerate(transitions):
-				if w != 0:
-					model.add_transition(q0, a, q1, w)
-	teacher_start = process_time()
-	cex = check_counterexample(wfa, model, membership_queries, verbose=verbose)
-	teacher_stop = process_time()
-	total_teacher_time += teacher_stop - teacher_start
-	return cex, model, membership_queries, total_teacher_time
-	
-def minimal_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexample=HKC, verbose=False):
+def minimal_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexample=HKC, counterexample_suffixes=all_suffixes, check_closed_batch=None, instrument=NO_INSTRUMENTATION, verbose=False):
 	"""
 	Learns wfa using Lstar for weighted automata
 	Makes two changes from the standard algorithm to get smaller results:
 	1) The GCD of rows of SxE is computed. The GCD becomes the transition weight, the other factors are state weights
-	2) At the end of the algorithm, calculate basisvectors for the rows in S, then use those as the states instead of the rows themselves
+	2) At the end of the algorithm, minimize the model (see Weighted_Automaton.minimize), which keeps the weights integers
+	counterexample_suffixes, check_closed_batch and instrument are as in WLstar.weighted_Lstar
 	"""
-	S = [""]
-	E = [""]
-	membership_queries = {}
-	membership_queries[""] = wfa.member("")
-	membership_table = {"": {"": 1}} # membership_queries divided by GCD of row
-	GCDs = {"": membership_queries[""]}
-	transitions = {"": membership_queries[""]}
+	table = ObservationTable(wfa)
+	S = table.S
+	E = table.E
+	table.fill(S)
+	GCDs = {EPSILON: table.value(EPSILON, EPSILON)} # The rows of the table are divided by their GCD, see scaled_row
+	transitions = {EPSILON: table.value(EPSILON, EPSILON)}
 	closed_count = 0
 	equivalence_count = 0
 	cex_found = False
 	closed_after_counterexample = 0
 	total_teacher_time = 0
 	while True:
-		lin_com, S, transitions, membership_queries, membership_table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, membership_queries, membership_table, GCDs, closed_count=closed_count, cex_found=cex_found, check_closed=check_closed, verbose=verbose)
+		lin_com, S, transitions, table, GCDs, closed_count, cex_found = check_table_closed_count(wfa, S, E, transitions, table, GCDs, closed_count=closed_count, cex_found=cex_found, check_closed=check_closed, check_closed_batch=check_closed_batch, instrument=instrument, verbose=verbose)
 		if cex_found:
 			closed_after_counterexample += 1
-		model = create_machine(wfa.alphabet, S, (membership_table[s][""] for s in S), lin_com)
+		with instrument.phase("create_machine"):
+			model = create_machine(wfa.alphabet, S, (scaled_row(table, s, GCDs)[0] for s in S), lin_com) #E[0] is the empty word
 		equivalence_count += 1
 		teacher_start = process_time()
-		cex = check_counterexample(wfa, model, membership_queries, verbose=verbose)
+		with instrument.phase("equivalence query"):
+			cex = word(check_counterexample(wfa, model, table.queries, verbose=verbose))
 		teacher_stop = process_time()
 		total_teacher_time += teacher_stop - teacher_start
 		if verbose:
@@ -312,20 +297,21 @@ def minimal_weighted_Lstar(wfa, check_closed=closed_by_gap, check_counterexample
 			if cex is not None:
 				print("WFA:", wfa.member(cex), "Model:", model.member(cex))
 		if cex is None:
-			while True:
-				#Calculate basisvectors
-				cex, model, membership_queries, total_teacher_time = basis_by_gap(wfa, S, E, membership_queries, membership_table, GCDs, total_teacher_time, check_closed=check_closed, check_counterexample=check_counterexample, verbose=verbose)
-				if cex is None:
-					return model, len(membership_queries), closed_count, equivalence_count, closed_after_counterexample, total_teacher_time
-				E, transitions, membership_table, membership_queries, GCDs = handle_counterexample(wfa, cex, S, E, transitions, membership_table, membership_queries, GCDs, verbose=verbose)
+			#The model is equivalent to wfa, so its minimization is as well (no further equivalence queries needed)
+			with instrument.phase("minimize"):
+				model = model.minimize()
+			instrument.count_run(len(table.queries), closed_count, equivalence_count)
+			return model, len(table.queries), closed_count, equivalence_count, closed_after_counterexample, total_teacher_time, len(E)
 		cex_found = True
-		E, transitions, membership_table, membership_queries, GCDs = handle_counterexample(wfa, cex, S, E, transitions, membership_table, membership_queries, GCDs, verbose=verbose)
+		with instrument.phase("counterexample processing"):
+			columns = counterexample_suffixes(wfa, model, cex, S, table.queries, scale=GCDs)
+		E, transitions, table, GCDs = handle_counterexample(wfa, cex, S, E, transitions, table, GCDs, columns=columns, instrument=instrument, verbose=verbose)
 
 if __name__ == "__main__":
 	#aut = random_automaton(alphabet=['a', 'b'], min_states=2, max_states=2, pos_weights=list(range(-5, 5)), min_transitions=2)
 	aut = load_automaton("Examples/38o.txt")
 	print(aut)
-	res, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time = minimal_weighted_Lstar(aut, check_closed=closed_by_gap, check_counterexample=HKC, verbose=True)
-	print(membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time)
+	res, membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time, columns = minimal_weighted_Lstar(aut, check_closed=closed_by_gap, check_counterexample=HKC, verbose=True)
+	print(membership_count, closed_count, equivalence_count, closed_after_counterexample, total_teacher_time, columns)
 	#res = weighted_Lstar(aut, check_closed=closed_by_gap, check_counterexample=HKC, verbose=True)
 	compare_machines(aut, res, prover=HKC)
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Randomized checks of the exact solvers, the word encoding and the equivalence oracles
+Every test uses its own seeded random number generator, so a failure can be reproduced by running the test again
+"""
+import itertools
+import random
+from fractions import Fraction
+
+from lattice import IntegerLattice, hermite_normal_form, solution_int_mat
+from modular import independent_rows
+from rational import RationalSpan, rank
+from weighted_automaton import Weighted_Automaton, random_automaton, suffixes
+from words import EPSILON, word, letters
+from WLstar import weighted_Lstar, rivest_schapire, all_suffixes
+from native_main import IncrementalHNF, tzeng
+
+def times(x, M):
+	"""The vector x*M"""
+	return [sum(a * row[j] for a, row in zip(x, M)) for j in range(len(M[0]))]
+
+def random_matrix(rng, k, n, bound=5):
+	return [[rng.randint(-bound, bound) for j in range(n)] for i in range(k)]
+
+def low_rank_matrix(rng, k, r, n):
+	"""
+	A k x n matrix of rank r and a basis B of its row space, where B = [I | C] so e_j is not in the row space for j >= r
+	"""
+	B = [[int(i == j) for j in range(r)] + [rng.randint(-3, 3) for j in range(n - r)] for i in range(r)]
+	A = [[int(i == j) for j in range(r)] for i in range(r)] + random_matrix(rng, k - r, r)
+	rng.shuffle(A)
+	return [times(a, B) for a in A], B
+
+def automaton_pair(rng, alphabet):
+	"""A random automaton, and a copy in which one weight may be changed"""
+	aut = random_automaton(alphabet=alphabet, min_states=1, max_states=3, pos_weights=list(range(-2, 3)), max_transitions=3, rng=rng)
+	weights = list(aut.weights)
+	if rng.random() < 0.5:
+		weights[rng.randrange(len(weights))] += 1
+	return aut, Weighted_Automaton(aut.alphabet, weights, aut.transitions, aut.initial)
+
+def test_hermite_normal_form():
+	rng = random.Random(1)
+	for _ in range(200):
+		M = random_matrix(rng, rng.randint(1, 6), rng.randint(1, 6))
+		H, U = hermite_normal_form(M)
+		assert [times(u, M) for u in U] == H
+		pivots = [next(j for j, a in enumerate(h) if a != 0) for h in H]
+		assert pivots == sorted(set(pivots))
+		for i, p in enumerate(pivots):
+			assert H[i][p] > 0
+			assert all(0 <= H[k][p] < H[i][p] for k in range(i))
+		assert len(H) == rank(M)
+
+def test_solution_int_mat():
+	rng = random.Random(2)
+	for _ in range(200):
+		M = random_matrix(rng, rng.randint(1, 5), rng.randint(1, 5))
+		v = times([rng.randint(-4, 4) for row in M], M)
+		x = solution_int_mat(M, v)
+		assert x is not None and times(x, M) == v
+		# Every vector of the lattice of 2*M is even, so v with one odd entry is not in it
+		M2 = [[2 * a for a in row] for row in M]
+		v2 = times([rng.randint(-4, 4) for row in M], M2)
+		v2[rng.randrange(len(v2))] += 1
+		assert solution_int_mat(M2, v2) is None
+
+def test_integer_lattice_insert():
+	"""Adding rows and columns one by one gives the same answers as solving from scratch"""
+	rng = random.Random(3)
+	for _ in range(100):
+		k, n = rng.randint(1, 5), rng.randint(1, 5)
+		M = random_matrix(rng, k, n + 2)
+		lattice = IntegerLattice(width=n)
+		for row in M:
+			lattice.add_row(row[:n])
+		lattice.add_columns([[row[j] for row in M] for j in range(n, n + 2)])
+		assert [b for p, b, bt in lattice.basis] == hermite_normal_form(M)[0] # The normal form of a lattice is unique
+		for _ in range(5):
+			v = times([rng.randint(-2, 2) for row in M], M)
+			if rng.random() < 0.5:
+				v[rng.randrange(len(v))] += rng.randint(1, 3)
+			x = lattice.solve(v)
+			assert (x is None) == (solution_int_mat(M, v) is None)
+			if x is not None:
+				assert times(x, M) == v
+
+def test_rational_span():
+	rng = random.Random(4)
+	for _ in range(200):
+		n = rng.randint(2, 6)
+		r = rng.randint(1, n - 1)
+		M, B = low_rank_matrix(rng, rng.randint(r, r + 3), r, n)
+		span = RationalSpan(M)
+		assert len(span) == r
+		v = [Fraction(a, 3) for a in times([rng.randint(-3, 3) for b in B], B)]
+		x = span.solve(v)
+		assert x is not None and times(x, M) == v
+		assert span.solve([int(j == n - 1) for j in range(n)]) is None
+
+def test_modular_prefilter():
+	"""Rows in the span are never rejected, rows outside of it are rejected (the primes are far above the entries)"""
+	rng = random.Random(5)
+	for _ in range(200):
+		n = rng.randint(2, 6)
+		r = rng.randint(1, n - 1)
+		M, B = low_rank_matrix(rng, r, r, n)
+		inside = times([rng.randint(-3, 3) for b in B], B)
+		outside = [int(j == n - 1) for j in range(n)]
+		assert independent_rows(M, [inside, outside], n) == [False, True]
+
+def test_words():
+	rng = random.Random(6)
+	alphabet = ["ab", "c", "de", "x"]
+	for _ in range(200):
+		ls = rng.choices(alphabet, k=rng.randint(0, 6))
+		w = word(ls)
+		assert len(w) == len(ls)
+		assert letters(w) == ls
+		assert word(w) == w
+		if ls:
+			assert [letters(s) for s in suffixes(w)] == [ls[-i:] for i in range(1, len(ls) + 1)]
+	assert word([]) == EPSILON
+	assert word(None) is None
+
+def test_forward_cache():
+	rng = random.Random(7)
+	for alphabet in (["a", "b"], ["ab", "c", "de"]):
+		aut = random_automaton(alphabet=alphabet, min_states=2, max_states=4, pos_weights=list(range(-2, 3)), rng=rng)
+		cached = Weighted_Automaton(aut.alphabet, aut.weights, aut.transitions, aut.initial, cache_size=20)
+		for _ in range(500):
+			w = word(rng.choices(alphabet, k=rng.randint(0, 8)))
+			assert cached.member(w) == aut.member(w)
+		assert len(cached.cache) <= 20
+
+def test_tzeng():
+	"""A difference, if any, shows up on a word shorter than the total number of states, and tzeng finds a shortest one"""
+	rng = random.Random(8)
+	for alphabet in (["a", "b"], ["ab", "c"]):
+		for _ in range(50):
+			aut, model = automaton_pair(rng, alphabet)
+			n = len(aut.weights) + len(model.weights)
+			differ = [w for k in range(n) for w in map(word, itertools.product(alphabet, repeat=k)) if aut.member(w) != model.member(w)]
+			cex = tzeng(aut, model, {})
+			if differ:
+				assert cex is not None and aut.member(cex) != model.member(cex)
+				assert len(cex) == len(differ[0])
+			else:
+				assert cex is None
+
+def test_minimize():
+	rng = random.Random(9)
+	for alphabet in (["a", "b"], ["ab", "c", "de"]):
+		for _ in range(30):
+			aut = random_automaton(alphabet=alphabet, min_states=1, max_states=5, pos_weights=list(range(-2, 3)), rng=rng)
+			minimal = aut.minimize()
+			assert len(minimal.weights) <= len(aut.weights)
+			assert tzeng(aut, minimal, {}) is None
+			assert len(minimal.minimize().weights) == len(minimal.weights)
+			assert all(isinstance(x, int) for x in minimal.weights + minimal.initial)
+
+def test_learning():
+	rng = random.Random(10)
+	for alphabet in (["a", "b"], ["ab", "c", "de"]):
+		for counterexample_suffixes in (all_suffixes, rivest_schapire):
+			for _ in range(5):
+				aut = random_automaton(alphabet=alphabet, min_states=1, max_states=4, pos_weights=list(range(-2, 3)), rng=rng)
+				backend = IncrementalHNF()
+				model = weighted_Lstar(aut, check_closed=backend, check_closed_batch=backend.batch, check_counterexample=tzeng,
+					counterexample_suffixes=counterexample_suffixes)
+				assert tzeng(aut, model, {}) is None
+				assert len(model.weights) >= len(aut.minimize().weights)
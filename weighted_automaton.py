@@ -1,5 +1,12 @@
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
+from array import array
 import random
+import struct
+import sys
+
+from lattice import IntegerLattice, hermite_normal_form
+from rational import RationalSpan, integer_vector
+from words import EPSILON, code, codes
 
 class Weighted_Automaton:
 	""""
@@ -12,8 +19,9 @@ class Weighted_Automaton:
 		q1: integer, the ending state
 		w: semiring element, weight of the transition
 	initial: list of semiring elements, initial distributions of weights over the state
+	cache_size: maximum number of prefixes for which the forward distribution is memoized (0 disables the cache)
 	"""
-	def __init__(self, alphabet=None, weights=None, transitions=None, initial=None):
+	def __init__(self, alphabet=None, weights=None, transitions=None, initial=None, cache_size=0):
 		if alphabet is None:
 			self.alphabet = []
 		else:
@@ -32,6 +40,12 @@ class Weighted_Automaton:
 				self.initial[0] = 1
 		else:
 			self.initial = list(initial)
+		self.matrices = None # Compiled from transitions by sparse_matrices, reset when the automaton changes
+		self.cache_size = cache_size
+		self.cache_trie = {} # The cached prefixes as a trie, see forward
+		self.cache = OrderedDict() # The nodes of the trie by id, least recently used first
+		self.cache_hits = 0
+		self.cache_misses = 0
 			
 	def __str__(self):
 		return "Alphabet: {0}\nWeights: {1}\nTransitions: {2}\nInitial: {3}".format(str(self.alphabet), str(self.weights),
@@ -40,12 +54,14 @@ class Weighted_Automaton:
 	def add_state(self, weight, initial=0, verbose=False):
 		self.weights.append(weight)
 		self.initial.append(initial)
-		if confirm:
+		self.changed()
+		if verbose:
 			print("State {0} has weight {1}".format(len(self.weights)-1, weight))
 	
 	def add_transition(self, q0, a, q1, w):
 		if q0 < len(self.weights) and q1 < len(self.weights) and a in self.alphabet:
 			self.transitions[(q0, a)].append((q1, w))
+			self.changed()
 		else:
 			print("Invalid transition: Not added to the automaton")
 			if q0 >= len(self.weights):
@@ -55,51 +71,261 @@ class Weighted_Automaton:
 			if a not in self.alphabet:
 				print("Letter {0} not in alphabet, alphabet is {1}".format(a, self.alphabet))
 	
-	def member(self, word, verbose=False):
-		distribution = self.initial
+	def changed(self):
+		"""Throw away everything computed from the transitions, call this after changing the automaton"""
+		self.matrices = None
+		self.cache_trie.clear()
+		self.cache.clear()
+
+	def cache_info(self):
+		return {"hits": self.cache_hits, "misses": self.cache_misses, "size": len(self.cache), "max_size": self.cache_size}
+
+	def sparse_matrices(self):
+		"""
+		The transitions as one sparse matrix per letter, in CSR form: a tuple (indptr, indices, data) where
+		the transitions leaving q0 go to the states indices[indptr[q0]:indptr[q0+1]] with weights data[indptr[q0]:indptr[q0+1]]
+		The matrix of a letter is found under the letter and under its code (see words.py), the code is what words contain
+		All three are plain lists: the products are computed with exact Python numbers, so typed arrays would only add
+		the cost of converting every element that is read
+		"""
+		if self.matrices is None:
+			n = len(self.weights)
+			rows = {a: [[] for q in range(n)] for a in self.alphabet}
+			for (q0, a), ts in self.transitions.items():
+				if ts:
+					rows.setdefault(a, [[] for q in range(n)])[q0].extend(ts)
+			self.matrices = {}
+			for a, letter_rows in rows.items():
+				indptr = [0]
+				indices = []
+				data = []
+				for ts in letter_rows:
+					for q1, w in ts:
+						indices.append(q1)
+						data.append(w)
+					indptr.append(len(indices))
+				self.matrices[a] = self.matrices[code(a)] = (indptr, indices, data) # Words contain the codes of the letters
+		return self.matrices
+
+	def next_distribution(self, distribution, a):
+		"""The distribution after reading letter a, as the product of distribution with the sparse matrix of a"""
+		next_distribution = [0] * len(self.weights)
+		matrix = self.sparse_matrices().get(a)
+		if matrix is None:
+			return next_distribution
+		indptr, indices, data = matrix
+		for q0, w1 in enumerate(distribution):
+			if w1 != 0:
+				for k in range(indptr[q0], indptr[q0+1]):
+					next_distribution[indices[k]] += w1 * data[k]
+		return next_distribution
+
+	def forward(self, word):
+		"""
+		The distribution after reading word from the initial distribution
+		If the cache is enabled, continue from the longest prefix of word in the cache, and cache the prefixes of word
+		The cache is a trie of prefixes, so the longest cached prefix is found by going down the letters of word once
+		"""
+		if self.cache_size <= 0:
+			distribution = self.initial
+			for a in word:
+				distribution = self.next_distribution(distribution, a)
+			return distribution
+		path = [] # The trie nodes of the prefixes of word, shortest first
+		children = self.cache_trie
 		for a in word:
-			next_distribution = [0] * len(self.weights)
-			for q0, w1 in enumerate(distribution):
-				ts = self.transitions[(q0, a)]
-				for q1, w2 in ts:
-					next_distribution[q1] += w1 * w2
-			distribution = next_distribution
+			node = children.get(a)
+			if node is None:
+				break
+			path.append(node)
+			children = node[0]
+		if path:
+			self.cache_hits += 1
+			distribution = path[-1][3]
+		else:
+			self.cache_misses += 1
+			distribution = self.initial
+		for a in word[len(path):]:
+			distribution = self.next_distribution(distribution, a)
+			node = children[a] = [{}, children, a, distribution] # Trie node: [children, children of its parent, letter, distribution]
+			self.cache[id(node)] = node
+			path.append(node)
+			children = node[0]
+		for node in reversed(path): # A prefix is always used at least as recently as its extensions, so only leaves are evicted
+			self.cache.move_to_end(id(node))
+		while len(self.cache) > self.cache_size:
+			node = self.cache.popitem(last=False)[1]
+			del node[1][node[2]]
+		return distribution
+
+	def member(self, word, verbose=False):
+		distribution = self.forward(word)
 		if verbose:
 			print(word, distribution, self.weights)
 		return sum(a*b for a, b in zip(distribution, self.weights))
 		
 	def member_distribution(self, word, distribution = None, verbose=False):
 		if distribution is None:
-			distribution = self.initial
-		for a in word:
-			next_distribution = [0] * len(self.weights)
-			for q0, w1 in enumerate(distribution):
-				ts = self.transitions[(q0, a)]
-				for q1, w2 in ts:
-					next_distribution[q1] += w1 * w2
-			distribution = next_distribution
+			distribution = self.forward(word)
+		else:
+			for a in word:
+				distribution = self.next_distribution(distribution, a)
 		if verbose:
 			print(word, distribution, self.weights)
 		return sum(a*b for a, b in zip(distribution, self.weights)), distribution
+
+	def member_batch(self, words):
+		"""
+		The weights of all words in words, in the same order
+		The words are put in a prefix trie, so the distribution of a shared prefix is computed only once
+		Example: member_batch(["ab", "abb", "b"]) computes the distributions of "a", "ab", "abb" and "b" once each
+		"""
+		root = [{}, None] # Trie node: [children, weight]
+		nodes = []
+		for word in words:
+			node = root
+			for a in word:
+				if a not in node[0]:
+					node[0][a] = [{}, None]
+				node = node[0][a]
+			nodes.append(node)
+		root[1] = sum(a*b for a, b in zip(self.initial, self.weights))
+		todo = [(root, self.initial)]
+		while todo:
+			node, distribution = todo.pop()
+			for a, child in node[0].items():
+				next_distribution = self.next_distribution(distribution, a)
+				child[1] = sum(a*b for a, b in zip(next_distribution, self.weights))
+				todo.append((child, next_distribution))
+		return [node[1] for node in nodes]
+
+	def previous_weights(self, weights, a):
+		"""The weights of the states before reading letter a, given the weights of the states after reading a"""
+		previous = [0] * len(self.weights)
+		matrix = self.sparse_matrices().get(a)
+		if matrix is None:
+			return previous
+		indptr, indices, data = matrix
+		for q0 in range(len(self.weights)):
+			previous[q0] = sum(data[k] * weights[indices[k]] for k in range(indptr[q0], indptr[q0+1]))
+		return previous
+
+	def backward(self, word):
+		"""The weights of the states for word: backward(word)[q] is the weight of reading word starting in state q"""
+		weights = self.weights
+		for a in reversed(word):
+			weights = self.previous_weights(weights, a)
+		return weights
+
+	def forward_vectors(self, words):
+		"""The forward distributions of all words, the distribution of a shared prefix is computed once"""
+		known = {}
+		result = []
+		for word in words:
+			i = len(word)
+			while i > 0 and word[:i] not in known:
+				i -= 1
+			distribution = known[word[:i]] if i > 0 else self.initial
+			for j in range(i, len(word)):
+				distribution = self.next_distribution(distribution, word[j])
+				known[word[:j+1]] = distribution
+			result.append(distribution)
+		return result
+
+	def backward_vectors(self, words):
+		"""The backward weights of all words, the weights of a shared suffix are computed once"""
+		known = {}
+		result = []
+		for word in words:
+			i = 0
+			while i < len(word) and word[i:] not in known:
+				i += 1
+			weights = known[word[i:]] if i < len(word) else self.weights
+			for j in range(i-1, -1, -1):
+				weights = self.previous_weights(weights, word[j])
+				known[word[j:]] = weights
+			result.append(weights)
+		return result
+
+	def member_table(self, rows, columns):
+		"""
+		The weights of r+c for all r in rows and c in columns, as a list of rows
+		Every entry is the product forward(r) * backward(c), so only len(rows) + len(columns) vectors are computed,
+		instead of evaluating len(rows) * len(columns) words
+		"""
+		backward = self.backward_vectors(columns)
+		table = []
+		for distribution in self.forward_vectors(rows):
+			nonzero = [(q, w) for q, w in enumerate(distribution) if w != 0]
+			table.append([sum(w * b[q] for q, w in nonzero) for b in backward])
+		return table
+
+	def minimize(self):
+		"""
+		Minimal automaton equivalent to this one, by a forward and then a backward reduction (Schutzenberger)
+		The number of states is the rank of the Hankel matrix, which no equivalent automaton can go below
+		If all weights are integers, the states are a basis of the lattice of forward (backward) vectors, so the weights stay integers
+		"""
+		return _reverse(_forward_reduction(_reverse(_forward_reduction(self))))
+
+def _is_integral(aut):
+	return all(type(x) is int for x in aut.initial + aut.weights) and all(type(w) is int for targets in aut.transitions.values() for _, w in targets)
+
+def _forward_reduction(aut):
+	"""Equivalent automaton whose states are a basis of the lattice (or, for rational weights, the span) of the forward distributions of aut"""
+	integral = _is_integral(aut)
+	span = IntegerLattice(width=len(aut.weights)) if integral else RationalSpan(width=len(aut.weights))
+	generators = []
+	todo = deque([list(aut.initial)])
+	while todo:
+		v = todo.popleft()
+		if v not in span:
+			v = v if integral else integer_vector(v)
+			span.add_row(v)
+			generators.append(v)
+			todo.extend(aut.next_distribution(v, a) for a in aut.alphabet)
+	basis = hermite_normal_form(generators)[0] if integral else generators
+	coordinates = IntegerLattice(basis) if integral else span
+	reduced = Weighted_Automaton(alphabet=aut.alphabet, weights=[sum(x*w for x, w in zip(b, aut.weights)) for b in basis],
+		initial=coordinates.solve(aut.initial))
+	for q0, b in enumerate(basis):
+		for a in aut.alphabet:
+			for q1, w in enumerate(coordinates.solve(aut.next_distribution(b, a))):
+				if w != 0:
+					reduced.add_transition(q0, a, q1, w)
+	return reduced
+
+def _reverse(aut):
+	"""The automaton reading words backwards: initial and final weights are swapped and every transition is reversed"""
+	reverse = Weighted_Automaton(alphabet=aut.alphabet, weights=list(aut.initial), initial=list(aut.weights))
+	for (q0, a), targets in aut.transitions.items():
+		for q1, w in targets:
+			reverse.add_transition(q1, a, q0, w)
+	return reverse
 		
-def random_automaton(alphabet=['a'], min_states=1, max_states=5, pos_weights=list(range(1, 5)), min_transitions=0, max_transitions=5):
-	"""The number of transitions will be max_states*len(alphabet) + max_transitions"""
+def random_automaton(alphabet=['a'], min_states=1, max_states=5, pos_weights=list(range(1, 5)), min_transitions=0, max_transitions=5, rng=None):
+	"""
+	The number of transitions will be max_states*len(alphabet) + max_transitions
+	rng is the random number generator (a random.Random), by default the global one of the random module
+	"""
+	if rng is None:
+		rng = random
 	weights = []
-	num_states = random.randint(min_states, max_states)
+	num_states = rng.randint(min_states, max_states)
 	for i in range(num_states):
-		weights.append(random.choice(pos_weights))
+		weights.append(rng.choice(pos_weights))
 	aut = Weighted_Automaton(alphabet, weights)
 	for a in alphabet:
 		for q0 in range(num_states):
-			w = random.choice(pos_weights)
-			q1 = random.randint(0, num_states-1)
+			w = rng.choice(pos_weights)
+			q1 = rng.randint(0, num_states-1)
 			aut.add_transition(q0, a, q1, w)
-	extra_transitions = random.randint(min_transitions, max_transitions)
+	extra_transitions = rng.randint(min_transitions, max_transitions)
 	for i in range(extra_transitions):
-		q0 = random.randint(0, num_states-1)
-		a = random.choice(alphabet)
-		q1 = random.randint(0, num_states-1)
-		w = random.choice(pos_weights)
+		q0 = rng.randint(0, num_states-1)
+		a = rng.choice(alphabet)
+		q1 = rng.randint(0, num_states-1)
+		w = rng.choice(pos_weights)
 		aut.add_transition(q0, a, q1, w)
 	return aut
 	
@@ -134,12 +360,108 @@ def load_automaton(filename):
 		aut.add_transition(q0, a, q1, w)
 	return aut
 	
+# Binary format: header (typecodes of the state and weight arrays, number of letters, states and transitions),
+# the letters as length-prefixed UTF-8, then the transitions as arrays (q0, letter index, q1), and the weights, the initial distribution
+# and the transition weights as one array. Every array uses the smallest integer type that fits its values,
+# weights that do not fit in 64 bits are written as zigzag varints (typecode "v")
+BINARY_HEADER = struct.Struct("<ccHII")
+UNSIGNED_TYPES = ((2**8, 'B'), (2**16, 'H'), (2**32, 'I'))
+SIGNED_TYPES = ((2**7, 'b'), (2**15, 'h'), (2**31, 'i'), (2**63, 'q'))
+
+def _typecode(values, types, default):
+	"""The first typecode in types whose bound is above the absolute value of every value"""
+	largest = max((x if x >= 0 else -x - 1 for x in values), default=0)
+	return next((typecode for bound, typecode in types if largest < bound), default)
+
+def _array_bytes(typecode, values):
+	"""The values as a little-endian array"""
+	a = array(typecode, values)
+	if sys.byteorder != "little":
+		a.byteswap()
+	return a.tobytes()
+
+def _array_from(typecode, data, offset, n):
+	"""Read n values of a little-endian array, returns the values and the offset after them"""
+	a = array(typecode)
+	a.frombytes(data[offset:offset + a.itemsize*n])
+	if sys.byteorder != "little":
+		a.byteswap()
+	return a, offset + a.itemsize*n
+
+def _write_varints(out, values):
+	for x in values:
+		x = 2*x if x >= 0 else -2*x - 1 # Zigzag, so small negative numbers stay short
+		while x >= 0x80:
+			out.append((x & 0x7f) | 0x80)
+			x >>= 7
+		out.append(x)
+
+def _read_varints(data, offset, n):
+	values = []
+	for _ in range(n):
+		x, shift = 0, 0
+		while True:
+			b = data[offset]
+			offset += 1
+			x |= (b & 0x7f) << shift
+			shift += 7
+			if b < 0x80:
+				break
+		values.append(x >> 1 if x % 2 == 0 else -(x >> 1) - 1)
+	return values, offset
+
+def automaton_to_bytes(aut):
+	"""The automaton in the binary format (only integer weights can be stored)"""
+	transitions = [(q0, aut.alphabet.index(a), q1, w) for (q0, a), v in aut.transitions.items() for q1, w in v]
+	weights = list(aut.weights) + list(aut.initial) + [t[3] for t in transitions]
+	if any(type(w) is not int for w in weights):
+		raise ValueError("The binary format only stores integer weights")
+	states = _typecode([len(aut.weights)], UNSIGNED_TYPES, 'I')
+	weight_type = _typecode(weights, SIGNED_TYPES, 'v')
+	out = bytearray(BINARY_HEADER.pack(states.encode(), weight_type.encode(), len(aut.alphabet), len(aut.weights), len(transitions)))
+	for a in aut.alphabet:
+		letter = a.encode("utf-8")
+		out += struct.pack("<H", len(letter)) + letter
+	for typecode, k in ((states, 0), (_typecode([len(aut.alphabet)], UNSIGNED_TYPES, 'H'), 1), (states, 2)):
+		out += _array_bytes(typecode, (t[k] for t in transitions))
+	if weight_type == 'v':
+		_write_varints(out, weights)
+	else:
+		out += _array_bytes(weight_type, weights)
+	return bytes(out)
+
+def automaton_from_bytes(data):
+	"""Read an automaton in the binary format from data (bytes, or a memoryview of a memory-mapped file)"""
+	states, weight_type, nletters, nstates, ntransitions = BINARY_HEADER.unpack_from(data, 0)
+	states, weight_type = states.decode(), weight_type.decode()
+	offset = BINARY_HEADER.size
+	alphabet = []
+	for _ in range(nletters):
+		(n, ) = struct.unpack_from("<H", data, offset)
+		alphabet.append(bytes(data[offset+2:offset+2+n]).decode("utf-8"))
+		offset += 2 + n
+	arrays = []
+	for typecode in (states, _typecode([nletters], UNSIGNED_TYPES, 'H'), states):
+		a, offset = _array_from(typecode, data, offset, ntransitions)
+		arrays.append(a)
+	n = 2*nstates + ntransitions
+	if weight_type == 'v':
+		weights, offset = _read_varints(data, offset, n)
+	else:
+		weights, offset = _array_from(weight_type, data, offset, n)
+		weights = weights.tolist()
+	aut = Weighted_Automaton(alphabet=alphabet, weights=weights[:nstates], initial=weights[nstates:2*nstates])
+	for q0, a, q1, w in zip(*arrays, weights[2*nstates:]):
+		aut.add_transition(q0, alphabet[a], q1, w)
+	return aut
+
 def create_machine(A, S, weights, lin_com):
-	initial = lin_com[""] if "" in lin_com else None
+	initial = lin_com[EPSILON] if EPSILON in lin_com else None
 	aut = Weighted_Automaton(alphabet=A, weights=weights, initial=initial)
+	letters = list(zip(A, codes(A))) # The letters with their codes, as they appear in words
 	for q0, s in enumerate(S):
-		for a in A:
-			for q1, w in enumerate(lin_com[s + a]):
+		for a, c in letters:
+			for q1, w in enumerate(lin_com[s + c]):
 				if w != 0:
 					aut.add_transition(q0, a, q1, w)
 	return aut
@@ -149,6 +471,7 @@ def suffixes(w):
 	The suffixes of w, including w itself
 	Excludes the empty string, unless w is the empty string,
 	in which case the iterator will only contain the empty string
+	Every character of w is one letter (see words.py), also for letters of more than one character
 	Example: suffixes("abc") = ("c", "bc", "abc")
 	Example: suffixes("") = ("")
 	"""
@@ -0,0 +1,51 @@
+"""
+Words over arbitrary symbols, as strings of letter codes
+Every letter is interned to an integer code, and a word is the string of the characters with these codes, so a word is
+a compact sequence of letter indices with a cached hash: w + code(a), w[:-1], suffixes and prefixes all work per letter,
+and building, hashing and slicing words costs exactly as much as it does for ordinary strings
+A single-character letter is its own code (the code of "a" is ord("a")), so over such alphabets, like those of the
+benchmark automata, a word is the plain string. Longer symbols get codes in a Unicode private use area:
+with the alphabet ["ab", "c"], word(["ab", "c"]) has length 2 and its suffixes are word(["c"]) and word(["ab", "c"])
+"""
+PRIVATE_USE = 0xF0000 # The first code given to a symbol of more than one character (Supplementary Private Use Area-A)
+
+LETTERS = {} # The letter of every code of a symbol of more than one character
+CODES = {} # Inverse of LETTERS
+
+EPSILON = "" # The empty word
+
+def code(a):
+	"""The code of letter a, as the one-character string that stands for a in words"""
+	if isinstance(a, str) and len(a) == 1:
+		return a
+	c = CODES.get(a)
+	if c is None:
+		if PRIVATE_USE + len(CODES) > 0x10FFFF:
+			raise ValueError("Too many letters of more than one character")
+		c = CODES[a] = chr(PRIVATE_USE + len(CODES))
+		LETTERS[c] = a
+	return c
+
+def codes(alphabet):
+	"""The codes of the letters of alphabet, the letters as they appear in words"""
+	return [code(a) for a in alphabet]
+
+def letter(c):
+	"""The letter with code c"""
+	return LETTERS.get(c, c)
+
+def word(letters):
+	"""
+	The word with the given letters, where a string is read as a word (a sequence of codes)
+	None stays None, so the result of a teacher can be given directly
+	Example: word(["ab", "c"]) + code("d") is the word with the letters "ab", "c" and "d"
+	"""
+	if letters is None or isinstance(letters, str):
+		return letters
+	return "".join(code(a) for a in letters)
+
+def letters(w):
+	"""The letters of the word w, as a list"""
+	if not LETTERS:
+		return list(w)
+	return [LETTERS.get(c, c) for c in w]